@@ -1,15 +1,49 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List
+import threading
+import time
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy import create_engine
-from google.cloud.sql.connector import Connector
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.engine import URL
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from app.settings import settings
 
-# Initialize the Cloud SQL connector
-connector = Connector()
+# Pool metrics, exposed through the /health/db endpoint
+class PoolMetrics(BaseModel):
+    connections_created: int = 0
+    connection_create_seconds_total: float = 0.0
+    connection_create_seconds_max: float = 0.0
+    checkouts: int = 0
+    checkout_wait_seconds_total: float = 0.0
+    checkout_wait_seconds_max: float = 0.0
+
+pool_metrics = PoolMetrics()
+_metrics_lock = threading.Lock()
+
+def record_connection_created(elapsed: float):
+    with _metrics_lock:
+        pool_metrics.connections_created += 1
+        pool_metrics.connection_create_seconds_total += elapsed
+        pool_metrics.connection_create_seconds_max = max(pool_metrics.connection_create_seconds_max, elapsed)
+
+def record_checkout(elapsed: float):
+    with _metrics_lock:
+        pool_metrics.checkouts += 1
+        pool_metrics.checkout_wait_seconds_total += elapsed
+        pool_metrics.checkout_wait_seconds_max = max(pool_metrics.checkout_wait_seconds_max, elapsed)
+
+# The Cloud SQL connectors are only created when they are actually used
+connector = None
+async_connector = None
 
 # Function to get database connection using the Cloud SQL connector
 def get_db_connection():
+    global connector
+    if connector is None:
+        from google.cloud.sql.connector import Connector
+        connector = Connector()
+
     # Ensure you're connecting with the correct instance connection name
     connection_name = settings.DB_CONNECTION_NAME  # Ensure this is correctly set to your Cloud SQL instance
     db_user = settings.DB_USER
@@ -26,22 +60,166 @@ def get_db_connection():
     )
     return conn
 
-# Create the SQLAlchemy engine using the connection
+# Async variant of get_db_connection, used by the async engine
+async def get_async_db_connection():
+    global async_connector
+    if async_connector is None:
+        from google.cloud.sql.connector import create_async_connector
+        async_connector = await create_async_connector()
+
+    start = time.perf_counter()
+    conn = await async_connector.connect_async(
+        settings.DB_CONNECTION_NAME,
+        "asyncpg",
+        user=settings.DB_USER,
+        password=settings.DB_PASS,
+        db=settings.DB_NAME,
+    )
+    record_connection_created(time.perf_counter() - start)
+    return conn
+
+class MeteredPoolMixin:
+    """
+    records how long callers wait to check out a connection from the pool
+    """
+    def connect(self):
+        start = time.perf_counter()
+        conn = super().connect()
+        record_checkout(time.perf_counter() - start)
+        return conn
+
+class MeteredQueuePool(MeteredPoolMixin, QueuePool):
+    pass
+
+class MeteredAsyncAdaptedQueuePool(MeteredPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+def build_url(driver: str = "pg8000") -> URL:
+    # Cloud SQL instance through the connector, the URL only selects the dialect
+    if settings.DB_CONNECTION_NAME:
+        return URL.create(f"postgresql+{driver}")
+
+    # Plain Postgres: DB_HOST is either a hostname (TCP) or the directory containing the unix socket
+    unix_socket = settings.DB_HOST.startswith("/")
+    return URL.create(
+        f"postgresql+{driver}",
+        username=settings.DB_USER,
+        password=settings.DB_PASS,
+        database=settings.DB_NAME,
+        host=None if unix_socket else settings.DB_HOST,
+        port=None if unix_socket else settings.DB_PORT,
+    )
+
+def build_connect_args() -> dict:
+    if not settings.DB_CONNECTION_NAME and settings.DB_HOST.startswith("/"):
+        return {"unix_sock": f"{settings.DB_HOST.rstrip('/')}/.s.PGSQL.{settings.DB_PORT}"}
+    return {}
+
+def build_async_connect_args() -> dict:
+    if not settings.DB_CONNECTION_NAME and settings.DB_HOST.startswith("/"):
+        # asyncpg takes the socket directory as host
+        return {"host": settings.DB_HOST.rstrip('/')}
+    return {}
+
+# Create the SQLAlchemy engine
 engine = create_engine(
-    f"postgresql+pg8000://{settings.DB_USER}:{settings.DB_PASS}@/{settings.DB_NAME}?host=/cloudsql/{settings.DB_CONNECTION_NAME}",
-    creator=get_db_connection,
+    build_url(),
+    connect_args=build_connect_args(),
+    poolclass=MeteredQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
 )
 
+# Every new DBAPI connection goes through here, so its creation time (e.g. the connector handshake) is recorded
+@event.listens_for(engine, "do_connect")
+def timed_connect(dialect, conn_rec, cargs, cparams):
+    start = time.perf_counter()
+    if settings.DB_CONNECTION_NAME:
+        conn = get_db_connection()
+    else:
+        conn = dialect.connect(*cargs, **cparams)
+    record_connection_created(time.perf_counter() - start)
+    return conn
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async engine (asyncpg), DB_ASYNC_URL overrides it, e.g. sqlite+aiosqlite:///./local.db for local tests
+def build_async_engine():
+    pool_options = dict(
+        poolclass=MeteredAsyncAdaptedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+
+    if settings.DB_ASYNC_URL:
+        url = make_url(settings.DB_ASYNC_URL)
+        # sqlite keeps its default pool
+        if url.get_backend_name() == "sqlite":
+            return create_async_engine(url)
+        return create_async_engine(url, **pool_options)
+
+    if settings.DB_CONNECTION_NAME:
+        return create_async_engine(build_url("asyncpg"), async_creator=get_async_db_connection, **pool_options)
+
+    async_engine = create_async_engine(build_url("asyncpg"), connect_args=build_async_connect_args(), **pool_options)
+
+    @event.listens_for(async_engine.sync_engine, "do_connect")
+    def timed_async_connect(dialect, conn_rec, cargs, cparams):
+        start = time.perf_counter()
+        conn = dialect.connect(*cargs, **cparams)
+        record_connection_created(time.perf_counter() - start)
+        return conn
+
+    return async_engine
+
+async_engine = build_async_engine()
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+def warm_up_pool(connections: int = settings.DB_POOL_WARMUP):
+    """
+    open `connections` connections up front so the first requests do not pay for the handshake
+    """
+    opened: List = []
+    try:
+        for _ in range(min(connections, settings.DB_POOL_SIZE)):
+            opened.append(engine.connect())
+    finally:
+        for conn in opened:
+            conn.close()
+
+async def warm_up_async_pool(connections: int = settings.DB_POOL_WARMUP):
+    opened: List = []
+    try:
+        for _ in range(min(connections, settings.DB_POOL_SIZE)):
+            opened.append(await async_engine.connect())
+    finally:
+        for conn in opened:
+            await conn.close()
+
+def get_pool_status() -> dict:
+    return {
+        "pool": engine.pool.status(),
+        "checked_out": engine.pool.checkedout(),
+        "async_pool": async_engine.pool.status(),
+        "metrics": pool_metrics.model_dump(),
+    }
+
 # Dependency to get DB session
 def get_db():
+    db = SessionLocal()
     try:
-        db = SessionLocal()
         yield db
-    except Exception as e:
-        print(f"Database connection error: {e}")
-        yield None
     finally:
         db.close()
+
+# Dependency to get an async DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,5 +1,5 @@
 from fastapi import Depends, FastAPI
-from fastapi.concurrency import asynccontextmanager
+from fastapi.concurrency import asynccontextmanager, run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 
 from sqlalchemy import create_engine
@@ -8,11 +8,36 @@ import os
 
 from app.routers import generate, test, evaluate, article, clusters
 from app.settings import settings
+from app.db_connection import async_engine, warm_up_pool, warm_up_async_pool, get_pool_status
+from app.models import article as article_models, test as test_models
+from app.services.news import news_store
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create the tables and open the first pool connections before serving requests
+    try:
+        async with async_engine.begin() as conn:
+            await article_models.create_tables(conn)
+        await warm_up_async_pool(settings.DB_POOL_WARMUP)
+    except Exception as e:
+        print(f"Async database startup failed: {e}")
+    try:
+        await run_in_threadpool(test_models.create_tables)
+        await run_in_threadpool(warm_up_pool, settings.DB_POOL_WARMUP)
+    except Exception as e:
+        print(f"Database startup failed: {e}")
+    try:
+        news_store.load()
+    except Exception as e:
+        print(f"Loading the news corpus failed: {e}")
+    yield
+    await async_engine.dispose()
 
 # App definition
 app = FastAPI(
     title="Tensorbolt Burda: Backend API",
-    description="CRUD endpoints for Team Tensorbolt's solution for Burda, HackaTUM2024"
+    description="CRUD endpoints for Team Tensorbolt's solution for Burda, HackaTUM2024",
+    lifespan=lifespan,
 )
 
 # Adding CORSMiddleware
@@ -21,6 +46,7 @@ app.add_middleware(
     allow_origins=settings.BACKEND_CORS_ORIGINS,  # You can restrict this to specific origins
     allow_methods=["*"],  # Allow all HTTP methods
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["X-Next-Cursor", "X-Missing-Article-Ids", "X-Missing-Article-Count"],  # Pagination cursor of GET /articles, skipped ids of /generate
 )
 
 # Health Check
@@ -28,6 +54,11 @@ app.add_middleware(
 def root():
     return {"message": "Welcome to Backend for Team Tensorbolt for Burda, HackaTUM2024!"}
 
+# Database pool status and checkout-wait/connection-creation metrics
+@app.get("/health/db", tags=["Health"])
+def db_health():
+    return get_pool_status()
+
 # Routers
 app.include_router(generate.router)
 app.include_router(test.router)
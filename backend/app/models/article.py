@@ -2,12 +2,19 @@ from pydantic import BaseModel
 from typing import List, Dict, Optional
 from datetime import datetime
 from sqlalchemy import Column, Integer, String, JSON, DateTime
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
-from app.db_connection import engine
 
 Base = declarative_base()
 
+# SQLite (DB_ASYNC_URL) stores func.now() as "YYYY-MM-DD HH:MM:SS" text, datetimes are bound in the same
+# format so the created_at comparisons of the list cursor match the stored values
+Timestamp = DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite",
+)
+
 # GenArticle schema
 class GenArticle(BaseModel):
     title: str
@@ -33,6 +40,13 @@ class ArticleUpdate(BaseModel):
 class BulkDeleteRequest(BaseModel):
     article_ids: List[int]
 
+class BulkCreateRequest(BaseModel):
+    articles: List[ArticleCreate]
+
+# Fields that can be requested through `GET /articles/?fields=...`
+ARTICLE_LIST_FIELDS = ("id", "title", "content", "news_data", "created_at", "updated_at")
+ARTICLE_LIST_DEFAULT_FIELDS = ("id", "content", "news_data", "created_at", "updated_at")
+
 # Response schema for articles
 class ArticleResponse(BaseModel):
     id: int
@@ -44,14 +58,25 @@ class ArticleResponse(BaseModel):
     class Config:
         from_attributes = True
 
+# Response schema for the (projected) article listing, only requested fields are set
+class ArticleListItem(BaseModel):
+    id: int
+    title: Optional[str] = None
+    content: Optional[GenArticle] = None
+    news_data: Optional[NewsData] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
 class Article(Base):
     __tablename__ = 'articles'
 
     id = Column(Integer, primary_key=True, index=True)
     content = Column(JSON, nullable=False)  # Stores the GenArticle object as JSON
     news_data = Column(JSON, nullable=True)  # Stores the NewsData object as JSON
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    created_at = Column(Timestamp, server_default=func.now(), index=True)
+    updated_at = Column(Timestamp, onupdate=func.now())
+
+# Create the table in the database (called once at startup)
+async def create_tables(conn):
+    await conn.run_sync(Base.metadata.create_all)
 
-# Create the table in the database
-Base.metadata.create_all(bind=engine)
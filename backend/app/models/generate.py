@@ -15,6 +15,7 @@ class NewsData(BaseModel):
     important_dates: Dict[str,str] # date,event
 
 class News(BaseModel):
+    id: str
     title: str
     content: str
     authors: List[str]
@@ -51,4 +52,5 @@ class UserPreferences(BaseModel):
 
 class GenerateArticleRequest(BaseModel):
     articles_ids: List[str]
-    user_prefs: UserPreferences
\ No newline at end of file
+    user_prefs: UserPreferences
+    use_all_news: bool = False  # generate from the whole news corpus instead of the selected articles
\ No newline at end of file
@@ -13,5 +13,6 @@ class Test(Base):
     name = Column(String(50))
     email = Column(String(100))
 
-# Create the table in the database
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+# Create the table in the database (called once at startup)
+def create_tables():
+    Base.metadata.create_all(bind=engine)
@@ -1,8 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.models.article import Article, ArticleCreate, ArticleUpdate, ArticleResponse, BulkDeleteRequest
-from app.db_connection import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import and_, or_, select, insert, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple
+from datetime import datetime
+import base64
+import json
+from app.models.article import (
+    Article, ArticleCreate, ArticleUpdate, ArticleResponse, ArticleListItem, BulkCreateRequest, BulkDeleteRequest,
+    ARTICLE_LIST_FIELDS, ARTICLE_LIST_DEFAULT_FIELDS,
+)
+from app.db_connection import get_async_db
 
 router = APIRouter(
     prefix="/articles",
@@ -12,28 +19,65 @@ router = APIRouter(
 
 # Create Article
 @router.post("/", response_model=ArticleResponse)
-def create_article(article: ArticleCreate, db: Session = Depends(get_db)):
+async def create_article(article: ArticleCreate, db: AsyncSession = Depends(get_async_db)):
     new_article = Article(
         content=article.content.dict(),
         news_data=article.news_data.dict() if article.news_data else None,
     )
     db.add(new_article)
-    db.commit()
-    db.refresh(new_article)
+    await db.commit()
+    await db.refresh(new_article)
     return new_article
 
+# Bulk routes are registered before the /{article_id} routes, which would otherwise match "bulk"
+
+# Bulk Create Articles (one INSERT for all rows)
+@router.post("/bulk", response_model=List[ArticleResponse])
+async def bulk_create_articles(request: BulkCreateRequest, db: AsyncSession = Depends(get_async_db)):
+    if not request.articles:
+        return []
+
+    rows = [
+        {
+            "content": article.content.dict(),
+            "news_data": article.news_data.dict() if article.news_data else None,
+        }
+        for article in request.articles
+    ]
+    result = await db.scalars(insert(Article).returning(Article), rows)
+    new_articles = result.all()
+    await db.commit()
+    return new_articles
+
+# Bulk Delete Articles (one DELETE ... RETURNING id)
+@router.delete("/bulk", response_model=dict)
+async def bulk_delete_articles(request: BulkDeleteRequest, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(
+        delete(Article)
+        .where(Article.id.in_(request.article_ids))
+        .returning(Article.id)
+        .execution_options(synchronize_session=False)
+    )
+    deleted_ids = result.scalars().all()
+
+    if not deleted_ids:
+        raise HTTPException(status_code=404, detail="No articles found for the provided IDs")
+
+    await db.commit()
+    return {"detail": f"{len(deleted_ids)} articles have been deleted", "deleted_ids": deleted_ids}
+
 # Get Article by ID
 @router.get("/{article_id}", response_model=ArticleResponse)
-def get_article(article_id: int, db: Session = Depends(get_db)):
-    article = db.query(Article).filter(Article.id == article_id).first()
+async def get_article(article_id: int, db: AsyncSession = Depends(get_async_db)):
+    article = await db.get(Article, article_id)
     if not article:
         raise HTTPException(status_code=404, detail="Article not found")
     return article
 
 # Update Article
 @router.put("/{article_id}", response_model=ArticleResponse)
-def update_article(article_id: int, article_update: ArticleUpdate, db: Session = Depends(get_db)):
-    article = db.query(Article).filter(Article.id == article_id).first()
+async def update_article(article_id: int, article_update: ArticleUpdate, db: AsyncSession = Depends(get_async_db)):
+    article = await db.get(Article, article_id)
     if not article:
         raise HTTPException(status_code=404, detail="Article not found")
 
@@ -42,38 +86,88 @@ def update_article(article_id: int, article_update: ArticleUpdate, db: Session =
     if article_update.news_data:
         article.news_data = article_update.news_data.dict()
 
-    db.commit()
-    db.refresh(article)
+    await db.commit()
+    await db.refresh(article)
     return article
 
-# List All Articles
-@router.get("/", response_model=List[ArticleResponse])
-def list_articles(db: Session = Depends(get_db)):
-    articles = db.query(Article).all()
-    return articles
+def encode_cursor(created_at: datetime, article_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), article_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, article_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(article_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    if not fields:
+        return list(ARTICLE_LIST_DEFAULT_FIELDS)
+
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in ARTICLE_LIST_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    # id and created_at are always needed to build the next cursor
+    return list(dict.fromkeys(["id", "created_at", *requested]))
+
+# List Articles (newest first, keyset paginated on created_at/id)
+@router.get(
+    "/",
+    response_model=List[ArticleListItem],
+    response_model_exclude_unset=True,
+)
+async def list_articles(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma separated subset of: " + ", ".join(ARTICLE_LIST_FIELDS)),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Only the requested columns are selected, so listing id/title/created_at never
+    loads the `content`/`news_data` JSON blobs. The cursor for the next page is
+    returned in the `X-Next-Cursor` header.
+    """
+    selected = parse_fields(fields)
+    columns = {
+        "id": Article.id,
+        "title": Article.content["title"].as_string().label("title"),
+        "content": Article.content,
+        "news_data": Article.news_data,
+        "created_at": Article.created_at,
+        "updated_at": Article.updated_at,
+    }
+
+    query = select(*[columns[field] for field in selected])
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.where(
+            or_(
+                Article.created_at < cursor_created_at,
+                and_(Article.created_at == cursor_created_at, Article.id < cursor_id),
+            )
+        )
+
+    # Fetch one extra row to know whether there is a next page
+    result = await db.execute(query.order_by(Article.created_at.desc(), Article.id.desc()).limit(limit + 1))
+    rows = result.all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    return [ArticleListItem(**dict(row._mapping)) for row in rows]
 
 # Delete Article
 @router.delete("/{article_id}", response_model=dict)
-def delete_article(article_id: int, db: Session = Depends(get_db)):
-    article = db.query(Article).filter(Article.id == article_id).first()
+async def delete_article(article_id: int, db: AsyncSession = Depends(get_async_db)):
+    article = await db.get(Article, article_id)
     if not article:
         raise HTTPException(status_code=404, detail="Article not found")
     
-    db.delete(article)
-    db.commit()
+    await db.delete(article)
+    await db.commit()
     return {"detail": f"Article with ID {article_id} has been deleted"}
 
-
-# Bulk Delete Articles
-@router.delete("/bulk", response_model=dict)
-def bulk_delete_articles(request: BulkDeleteRequest, db: Session = Depends(get_db)):
-    articles_to_delete = db.query(Article).filter(Article.id.in_(request.article_ids)).all()
-    
-    if not articles_to_delete:
-        raise HTTPException(status_code=404, detail="No articles found for the provided IDs")
-    
-    for article in articles_to_delete:
-        db.delete(article)
-    
-    db.commit()
-    return {"detail": f"{len(articles_to_delete)} articles have been deleted"}
@@ -1,6 +1,7 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Response
 import json
 from app.settings import settings
+from app.services.clusters import ClusterStateError, ClusterView, cluster_store
 
 router = APIRouter(
     prefix="/cluster",
@@ -9,16 +10,29 @@ router = APIRouter(
 )
 
 @router.get("/")
-async def get_clusters():
+def get_clusters(request: Request, view: ClusterView = ClusterView.full):
     """
-    Load and return the content of clusters.json
+    Return the clusters (of clusters.json, or the live clusters of the online clusterer when
+    CLUSTER_STATE_PATH is set), `view=summary` drops the full article texts.
+    The body is serialized once per change and served with a strong ETag. A plain def, so the file
+    and SQLite reads run in the threadpool instead of on the event loop.
     """
     try:
-        file_path = "./clusters.json"
-        with open(file_path, "r") as file:
-            clusters = json.load(file)
-        return {"status": "success", "data": clusters}
+        cluster_body = cluster_store.get(view)
     except FileNotFoundError:
-        return {"status": "error", "message": "clusters.json not found"}
+        return {"status": "error", "message": "No clusters found"}
     except json.JSONDecodeError:
-        return {"status": "error", "message": "Failed to decode clusters.json"}
+        return {"status": "error", "message": "Failed to decode the clusters"}
+    except ClusterStateError:
+        return {"status": "error", "message": "Failed to read the clusters"}
+
+    body, encoding, etag = cluster_body.encoded(request.headers.get("accept-encoding", ""))
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
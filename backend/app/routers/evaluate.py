@@ -1,8 +1,10 @@
 from fastapi import FastAPI, APIRouter, HTTPException
 from pydantic import BaseModel, Field
-from typing import Dict, List
-import json
+from typing import Dict, List, Optional
+import asyncio
 from llama_index.llms.azure_openai import AzureOpenAI
+from app.services.cache import CacheMode, cache_key, make_cache
+from app.services.evaluate import evaluate_metrics
 from app.settings import settings
 
 router = APIRouter(
@@ -20,8 +22,26 @@ llm = AzureOpenAI(
     api_version=settings.AZURE_OPENAI_API_VERSION,
 )
 
+# Evaluations of complete (error free) results, keyed by text and model
+evaluation_cache = make_cache(
+    settings.EVALUATION_CACHE_BACKEND,
+    namespace="evaluation",
+    maxsize=settings.EVALUATION_CACHE_MAXSIZE,
+    ttl=settings.EVALUATION_CACHE_TTL,
+    path=settings.CACHE_SQLITE_PATH,
+)
+
 class TextInput(BaseModel):
     text: str
+    timeout: Optional[float] = Field(
+        None, gt=0, le=settings.EVALUATION_MAX_TIMEOUT, description="Seconds to wait for the metric evaluations."
+    )
+
+class BatchTextInput(BaseModel):
+    texts: List[str]
+    timeout: Optional[float] = Field(
+        None, gt=0, le=settings.EVALUATION_MAX_TIMEOUT, description="Seconds to wait for the metric evaluations of each text."
+    )
 
 class ScoreExplanation(BaseModel):
     score: float = Field(..., description="The score value for the evaluation metric.")
@@ -29,40 +49,59 @@ class ScoreExplanation(BaseModel):
 
 class EvaluationResponse(BaseModel):
     scores: Dict[str, ScoreExplanation]
+    errors: Dict[str, str] = Field(default_factory=dict, description="Metrics that could not be evaluated in time.")
 
 @router.post("/", response_model=EvaluationResponse)
 async def evaluate_text(input: TextInput):
-    try:
-        # Call the LLM to get scores for readability, SEO, engagement, originality, and coherence
-        response = llm.invoke(f"Evaluate the following text: {input.text}")
-        
-        # Assuming the response is a JSON with scores and explanations for each category
-        scores_data = json.loads(response)
-        
-        scores = {
-            "readability": ScoreExplanation(
-                score=scores_data.get("readability", 0),
-                explanation=scores_data.get("readability_explanation", "No explanation available.")
-            ),
-            "seo": ScoreExplanation(
-                score=scores_data.get("seo", 0),
-                explanation=scores_data.get("seo_explanation", "No explanation available.")
-            ),
-            "engagement": ScoreExplanation(
-                score=scores_data.get("engagement", 0),
-                explanation=scores_data.get("engagement_explanation", "No explanation available.")
-            ),
-            "originality": ScoreExplanation(
-                score=scores_data.get("originality", 0),
-                explanation=scores_data.get("originality_explanation", "No explanation available.")
-            ),
-            "coherence": ScoreExplanation(
-                score=scores_data.get("coherence", 0),
-                explanation=scores_data.get("coherence_explanation", "No explanation available.")
-            )
-        }
-
-        return EvaluationResponse(scores=scores)
-    
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+    # readability, seo, engagement, originality and coherence are evaluated concurrently
+    timeout = input.timeout or settings.EVALUATION_TIMEOUT
+    evaluations, errors = await evaluate_metrics(llm, input.text, timeout)
+
+    if not evaluations:
+        raise HTTPException(status_code=500, detail=errors)
+
+    scores = {
+        metric: ScoreExplanation(score=evaluation.score, explanation=evaluation.explanation)
+        for metric, evaluation in evaluations.items()
+    }
+    return EvaluationResponse(scores=scores, errors=errors)
+
+@router.post("/batch", response_model=List[EvaluationResponse])
+async def evaluate_batch(input: BatchTextInput, cache: CacheMode = CacheMode.use):
+    """
+    Evaluate many texts, one result per input text in the same order. Identical texts are evaluated once,
+    previously evaluated texts come from the cache and the rest run with bounded concurrency.
+    """
+    timeout = input.timeout or settings.EVALUATION_TIMEOUT
+    keys = [cache_key(text, llm.metadata.model_name) for text in input.texts]
+    unique_texts = dict(zip(keys, input.texts))
+
+    # one lookup for all the texts instead of one round trip per text
+    cached = await evaluation_cache.aget_many(list(unique_texts), cache)
+    results: Dict[str, EvaluationResponse] = {
+        key: EvaluationResponse.model_validate_json(value) for key, value in cached.items()
+    }
+
+    semaphore = asyncio.Semaphore(settings.EVALUATION_BATCH_CONCURRENCY)
+
+    async def evaluate(key: str, text: str):
+        async with semaphore:
+            evaluations, errors = await evaluate_metrics(llm, text, timeout)
+        result = EvaluationResponse(
+            scores={
+                metric: ScoreExplanation(score=evaluation.score, explanation=evaluation.explanation)
+                for metric, evaluation in evaluations.items()
+            },
+            errors=errors,
+        )
+        if not errors:
+            await evaluation_cache.aset(key, result.model_dump_json())
+        results[key] = result
+
+    await asyncio.gather(*[evaluate(key, text) for key, text in unique_texts.items() if key not in results])
+    return [results[key] for key in keys]
+
+# Hit/miss counters of the evaluation cache
+@router.get("/cache")
+def evaluation_cache_stats():
+    return evaluation_cache.stats()
@@ -1,10 +1,16 @@
 from datetime import datetime, timezone
-from typing import List
-from fastapi import APIRouter, HTTPException
+from typing import Dict, List
+from urllib.parse import quote
+import json
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from app.models.generate import GenArticle, GenerateArticleRequest
-from app.services.generate import read_news_json_file, generate_article
+from app.models.generate import GenArticle, GenerateArticleRequest, News
+from app.services.cache import CacheMode, make_cache
+from app.services.generate import generate_article, stream_article
+from app.services.fake_llm import FakeStreamingLLM
+from app.services.news import news_store
 from llama_index.llms.azure_openai import AzureOpenAI
 from app.settings import settings
 
@@ -17,14 +23,80 @@ llm = AzureOpenAI(
     temperature=0.2
 )
 
+# USE_FAKE_LLM streams a canned article, for testing the streaming endpoint locally
+stream_llm = FakeStreamingLLM() if settings.USE_FAKE_LLM else llm
+
+# Generated articles keyed by prompts, model and temperature
+generation_cache = make_cache(
+    settings.GENERATION_CACHE_BACKEND,
+    namespace="generation",
+    maxsize=settings.GENERATION_CACHE_MAXSIZE,
+    ttl=settings.GENERATION_CACHE_TTL,
+    path=settings.CACHE_SQLITE_PATH,
+)
+
+# At most this many skipped ids are listed in X-Missing-Article-Ids, X-Missing-Article-Count has the total
+MAX_REPORTED_MISSING_IDS = 20
+
 router = APIRouter(
     prefix="/generate",
     tags=["Generate Article"],
     responses={404: {"description": "Not found"}},
 )
 
+def select_news(generate_req: GenerateArticleRequest) -> tuple[List[News], Dict[str, str]]:
+    """
+    Only the selected articles are sent to the model, the whole corpus only with `use_all_news`.
+    Ids that are not in the corpus (e.g. articles of clusters.json that are missing from the news
+    file) are skipped and reported in the X-Missing-Article-Ids (percent-encoded, the first
+    MAX_REPORTED_MISSING_IDS) and X-Missing-Article-Count headers. Returns the news and the headers.
+    """
+    if generate_req.use_all_news:
+        news_list = news_store.get_all()
+        if not news_list:
+            raise HTTPException(status_code=503, detail="The news corpus is empty")
+        return news_list, {}
+
+    if not generate_req.articles_ids:
+        raise HTTPException(status_code=400, detail="No articles selected")
+    news_list, missing_ids = news_store.get_many(generate_req.articles_ids)
+    if not news_list:
+        raise HTTPException(status_code=404, detail="None of the selected articles were found")
+
+    headers = {}
+    if missing_ids:
+        headers["X-Missing-Article-Ids"] = ",".join(quote(id, safe="") for id in missing_ids[:MAX_REPORTED_MISSING_IDS])
+        headers["X-Missing-Article-Count"] = str(len(missing_ids))
+    return news_list, headers
+
 @router.post("/article")
-def generate(generate_req: GenerateArticleRequest) -> GenArticle:
-    news_list = read_news_json_file("./rss_feed_entries_2.json")
-    return generate_article(llm, generate_req.user_prefs, news_list)
-    
+def generate(generate_req: GenerateArticleRequest, response: Response, cache: CacheMode = CacheMode.use) -> GenArticle:
+    news_list, headers = select_news(generate_req)
+    response.headers.update(headers)
+    return generate_article(llm, generate_req.user_prefs, news_list, generation_cache, cache)
+
+@router.post("/article/stream")
+async def generate_stream(generate_req: GenerateArticleRequest, cache: CacheMode = CacheMode.use):
+    """
+    Server-Sent Events: `title`, `header` and `paragraph` events as soon as the model has written them,
+    then `done` with the full article (or `error`)
+    """
+    news_list, headers = select_news(generate_req)
+
+    async def event_stream():
+        try:
+            async for event, data in stream_article(stream_llm, generate_req.user_prefs, news_list, generation_cache, cache):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **headers},
+    )
+
+# Hit/miss counters of the generation cache
+@router.get("/cache")
+def generation_cache_stats():
+    return generation_cache.stats()
@@ -0,0 +1,200 @@
+from typing import Any, Dict, List, Optional
+from abc import ABC, abstractmethod
+from enum import Enum
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from cachetools import TTLCache
+
+
+class CacheMode(Enum):
+    use = 'use'
+    bypass = 'bypass'  # skip the lookup (forced regeneration), the new result is still stored
+
+
+def cache_key(*parts: Any) -> str:
+    """
+    content address of the given parts (prompts, model name, temperature, ...)
+    """
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ResponseCache(ABC):
+    """
+    key/value cache of serialized model responses with hit/miss counters
+    """
+
+    # lookups that block on I/O run in a worker thread when called from async code (aget/aset)
+    blocking = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "bypasses": 0, "writes": 0}
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def _set(self, key: str, value: str):
+        ...
+
+    def _get_many(self, keys: List[str]) -> Dict[str, str]:
+        values = {key: self._get(key) for key in keys}
+        return {key: value for key, value in values.items() if value is not None}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key: str, mode: CacheMode = CacheMode.use) -> Optional[str]:
+        if mode == CacheMode.bypass:
+            self._count("bypasses")
+            return None
+        value = self._get(key)
+        self._count("hits" if value is not None else "misses")
+        return value
+
+    def get_many(self, keys: List[str], mode: CacheMode = CacheMode.use) -> Dict[str, str]:
+        """
+        values of the cached keys, missing and expired keys are left out
+        """
+        if mode == CacheMode.bypass:
+            for _ in keys:
+                self._count("bypasses")
+            return {}
+        values = self._get_many(keys)
+        with self._lock:
+            self._stats["hits"] += len(values)
+            self._stats["misses"] += len(keys) - len(values)
+        return values
+
+    def set(self, key: str, value: str):
+        self._set(key, value)
+        self._count("writes")
+
+    async def aget(self, key: str, mode: CacheMode = CacheMode.use) -> Optional[str]:
+        if self.blocking:
+            return await asyncio.to_thread(self.get, key, mode)
+        return self.get(key, mode)
+
+    async def aget_many(self, keys: List[str], mode: CacheMode = CacheMode.use) -> Dict[str, str]:
+        if self.blocking:
+            return await asyncio.to_thread(self.get_many, keys, mode)
+        return self.get_many(keys, mode)
+
+    async def aset(self, key: str, value: str):
+        if self.blocking:
+            return await asyncio.to_thread(self.set, key, value)
+        self.set(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["backend"] = type(self).__name__
+        return stats
+
+
+class NullCache(ResponseCache):
+    def _get(self, key: str) -> Optional[str]:
+        return None
+
+    def _set(self, key: str, value: str):
+        pass
+
+
+class MemoryCache(ResponseCache):
+    """
+    in-process LRU cache, entries expire after `ttl` seconds
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__()
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._cache_lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._cache_lock:
+            return self._cache.get(key)
+
+    def _set(self, key: str, value: str):
+        with self._cache_lock:
+            self._cache[key] = value
+
+
+class SQLiteCache(ResponseCache):
+    """
+    on-disk cache shared between workers and restarts, one table per namespace.
+    Each thread keeps its own connection (sqlite3 connections can not be shared between threads).
+    """
+
+    blocking = True
+    max_keys_per_query = 500
+
+    def __init__(self, path: str, namespace: str, ttl: float):
+        super().__init__()
+        self.path = path
+        self.table = f"cache_{namespace}"
+        self.ttl = ttl
+        self._local = threading.local()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._connection()
+        # the journal mode is stored in the database file, set once instead of on every connection
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30)
+        return conn
+
+    def _get(self, key: str) -> Optional[str]:
+        row = self._connection().execute(
+            f"SELECT value FROM {self.table} WHERE key = ? AND created_at > ?",
+            (key, time.time() - self.ttl),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _get_many(self, keys: List[str]) -> Dict[str, str]:
+        values = {}
+        conn = self._connection()
+        # one query per chunk, SQLite limits the number of bound parameters
+        for start in range(0, len(keys), self.max_keys_per_query):
+            chunk = keys[start:start + self.max_keys_per_query]
+            rows = conn.execute(
+                f"SELECT key, value FROM {self.table} WHERE key IN ({', '.join('?' * len(chunk))}) AND created_at > ?",
+                (*chunk, time.time() - self.ttl),
+            ).fetchall()
+            values.update(rows)
+        return values
+
+    def _set(self, key: str, value: str):
+        with self._connection() as conn:  # commits on success
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+
+
+def make_cache(backend: str, namespace: str, maxsize: int, ttl: float, path: str) -> ResponseCache:
+    match backend:
+        case "memory":
+            return MemoryCache(maxsize=maxsize, ttl=ttl)
+        case "sqlite":
+            return SQLiteCache(path=path, namespace=namespace, ttl=ttl)
+        case "none":
+            return NullCache()
+    raise ValueError(f"Unknown cache backend: {backend}")
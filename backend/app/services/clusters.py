@@ -0,0 +1,168 @@
+from typing import Dict, List, Optional
+from dataclasses import dataclass
+from enum import Enum
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import threading
+
+from app.settings import settings
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+class ClusterStateError(Exception):
+    """
+    the online clusterer's state file is not a readable SQLite database
+    """
+
+
+class ClusterView(Enum):
+    full = 'full'
+    summary = 'summary'
+
+# Per-article keys dropped by the summary view (full scraped text and the rss html)
+SUMMARY_EXCLUDED_KEYS = ("content", "rss_summary")
+
+
+@dataclass(frozen=True)
+class ClusterBody:
+    body: bytes
+    gzip_body: bytes
+    brotli_body: Optional[bytes]
+    etag: str
+
+    def encoded(self, accept_encoding: str) -> tuple[bytes, Optional[str], str]:
+        """
+        pick the smallest precomputed body the client accepts, together with its encoding and ETag
+        (strong ETags have to differ between content encodings of the same resource)
+        """
+        accepted = [encoding.split(";")[0].strip() for encoding in accept_encoding.lower().split(",")]
+        if self.brotli_body is not None and "br" in accepted:
+            return self.brotli_body, "br", self.etag[:-1] + '-br"'
+        if "gzip" in accepted:
+            return self.gzip_body, "gzip", self.etag[:-1] + '-gzip"'
+        return self.body, None, self.etag
+
+
+def summarize_clusters(clusters: List[Dict]) -> List[Dict]:
+    return [
+        {
+            **cluster,
+            "cluster": [
+                {key: value for key, value in article.items() if key not in SUMMARY_EXCLUDED_KEYS}
+                for article in cluster.get("cluster", [])
+            ],
+        }
+        for cluster in clusters
+    ]
+
+
+def build_body(clusters: List[Dict]) -> ClusterBody:
+    body = json.dumps({"status": "success", "data": clusters}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return ClusterBody(
+        body=body,
+        gzip_body=gzip.compress(body, compresslevel=6, mtime=0),
+        brotli_body=brotli.compress(body) if brotli is not None else None,
+        etag='"' + hashlib.sha256(body).hexdigest() + '"',
+    )
+
+
+class ClusterStore:
+    """
+    Parses the clusters file once and keeps the serialized response bodies of every view.
+    The file is only parsed again when its mtime or size changes.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._stamp: Optional[tuple[int, int]] = None
+        self._bodies: Dict[ClusterView, ClusterBody] = {}
+
+    def _load(self) -> Dict[ClusterView, ClusterBody]:
+        with open(self.file_path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                raise json.JSONDecodeError("Empty file", "", 0)
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                clusters = json.loads(mapped[:])
+
+        return {
+            ClusterView.full: build_body(clusters),
+            ClusterView.summary: build_body(summarize_clusters(clusters)),
+        }
+
+    def get(self, view: ClusterView = ClusterView.full) -> ClusterBody:
+        stat = os.stat(self.file_path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    self._bodies = self._load()
+                    self._stamp = stamp
+        return self._bodies[view]
+
+
+class LiveClusterStore:
+    """
+    Serves the clusters published by the online clusterer (notebooks/online_clustering.py) from its
+    SQLite state. Every publish bumps the snapshot version, the bodies are only built again then,
+    and only for the views that are requested.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._clusters: List[Dict] = []
+        self._bodies: Dict[ClusterView, ClusterBody] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if not os.path.exists(self.db_path):
+                raise FileNotFoundError(self.db_path)
+            self._conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+        return self._conn
+
+    def get(self, view: ClusterView = ClusterView.full) -> ClusterBody:
+        with self._lock:
+            try:
+                row = self._connect().execute("SELECT version FROM snapshot WHERE id = 0").fetchone()
+            except sqlite3.OperationalError:
+                # no snapshot table yet, nothing was published
+                row = None
+            except sqlite3.DatabaseError as e:
+                # not a database or a corrupt one, reopened on the next request in case it is replaced
+                self._conn.close()
+                self._conn = None
+                raise ClusterStateError(f"Unreadable cluster state {self.db_path}: {e}") from e
+            if row is None:
+                raise FileNotFoundError(self.db_path)
+            if row[0] != self._version:
+                version, body = self._conn.execute("SELECT version, body FROM snapshot WHERE id = 0").fetchone()
+                self._clusters = json.loads(body)
+                self._bodies = {}
+                self._version = version
+            if view not in self._bodies:
+                clusters = self._clusters if view == ClusterView.full else summarize_clusters(self._clusters)
+                self._bodies[view] = build_body(clusters)
+            return self._bodies[view]
+
+
+def get_cluster_store():
+    """
+    the live clusters when CLUSTER_STATE_PATH is set, otherwise the clusters.json file
+    """
+    if settings.CLUSTER_STATE_PATH:
+        return LiveClusterStore(settings.CLUSTER_STATE_PATH)
+    return ClusterStore("./clusters.json")
+
+
+cluster_store = get_cluster_store()
@@ -0,0 +1,63 @@
+from typing import Dict, Optional
+import asyncio
+
+from llama_index.core.llms import LLM
+from llama_index.core.prompts import PromptTemplate
+
+from app.models.evaluate import MetricEvaluation
+
+# Metrics evaluated by /evaluate, each one is a separate structured call
+EVALUATION_METRICS: Dict[str, str] = {
+    "readability": "How easy the text is to read: sentence length, structure, clarity and flow.",
+    "seo": "How well the text is optimized for search engines: keywords, headings and topical focus.",
+    "engagement": "How well the text captures and keeps the reader's attention.",
+    "originality": "How original the text is in its angle, wording and insights.",
+    "coherence": "How logically connected and consistent the text is from start to end.",
+}
+
+_metric_prompt = PromptTemplate(
+    "You are an expert editor evaluating an article.\n"
+    "Evaluate only the following metric: {metric}.\n"
+    "{description}\n"
+    "Give a score between 1 and 10 and a short explanation for the score.\n\n"
+    "Text:\n"
+    "------\n"
+    "{text}\n"
+    "------"
+)
+
+
+async def evaluate_metric(llm: LLM, metric: str, text: str) -> MetricEvaluation:
+    return await llm.astructured_predict(
+        MetricEvaluation,
+        _metric_prompt,
+        metric=metric,
+        description=EVALUATION_METRICS[metric],
+        text=text,
+    )
+
+
+async def evaluate_metrics(llm: LLM, text: str, timeout: Optional[float]) -> tuple[Dict[str, MetricEvaluation], Dict[str, str]]:
+    """
+    evaluate all metrics concurrently, so the latency is the one of the slowest call (at most `timeout`).
+    Returns the evaluations that finished in time and an error message for every other metric.
+    """
+    tasks = {
+        metric: asyncio.create_task(evaluate_metric(llm, metric, text))
+        for metric in EVALUATION_METRICS
+    }
+    _, pending = await asyncio.wait(tasks.values(), timeout=timeout)
+    for task in pending:
+        task.cancel()
+
+    evaluations: Dict[str, MetricEvaluation] = {}
+    errors: Dict[str, str] = {}
+    for metric, task in tasks.items():
+        if task in pending:
+            errors[metric] = f"Timed out after {timeout} seconds"
+        elif task.exception() is not None:
+            errors[metric] = str(task.exception())
+        else:
+            evaluations[metric] = task.result()
+
+    return evaluations, errors
@@ -0,0 +1,75 @@
+from typing import Any, Sequence
+import asyncio
+import json
+import time
+
+from llama_index.core.llms import (
+    CustomLLM,
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    CompletionResponse,
+    CompletionResponseGen,
+    LLMMetadata,
+    MessageRole,
+)
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+
+from app.models.generate import GenArticle
+
+# Canned article returned by the fake LLM
+FAKE_ARTICLE = GenArticle(
+    title="Electric Cars Are Getting Cheaper",
+    headers=["Falling Battery Prices", "More Affordable Models", "What It Means for Buyers"],
+    paragraphs=[
+        "Battery pack prices dropped again this year, which is the main driver behind cheaper electric cars.",
+        "Several manufacturers announced compact models that cost about as much as their petrol counterparts.",
+        "For buyers the total cost of ownership of an electric car is now lower in most European markets.",
+    ],
+)
+
+
+class FakeStreamingLLM(CustomLLM):
+    """
+    Local LLM for testing the streaming endpoints without a model: it streams the JSON of
+    a fixed GenArticle (keys ordered title, headers, paragraphs) in small chunks with a delay.
+    """
+
+    article: GenArticle = FAKE_ARTICLE
+    chunk_size: int = 8
+    delay: float = 0.02
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="fake-streaming-llm", is_chat_model=True)
+
+    def _response_text(self) -> str:
+        return json.dumps({
+            "title": self.article.title,
+            "headers": self.article.headers,
+            "paragraphs": self.article.paragraphs,
+        })
+
+    def _chunks(self):
+        text = self._response_text()
+        for start in range(0, len(text), self.chunk_size):
+            yield text[:start + self.chunk_size], text[start:start + self.chunk_size]
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        return CompletionResponse(text=self._response_text())
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        for text, delta in self._chunks():
+            time.sleep(self.delay)
+            yield CompletionResponse(text=text, delta=delta)
+
+    @llm_chat_callback()
+    async def astream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseAsyncGen:
+        async def gen() -> ChatResponseAsyncGen:
+            for text, delta in self._chunks():
+                await asyncio.sleep(self.delay)
+                yield ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=text), delta=delta)
+
+        return gen()
@@ -1,4 +1,4 @@
-from typing import List, Optional, Dict
+from typing import AsyncGenerator, Iterator, List, Optional, Dict
 from pydantic import BaseModel
 from llama_index.core import (
     VectorStoreIndex,
@@ -19,9 +19,10 @@ from llama_index.llms.azure_openai import AzureOpenAI
 
 
 import json
-from llama_index.core.llms import ChatMessage, MessageRole, ChatResponse
+from llama_index.core.llms import LLM, ChatMessage, MessageRole, ChatResponse
 from llama_index.core.llms.structured_llm import StructuredLLM
 from app.models.generate import News, NewsData, UserPreferences, GenArticle, Tone, Style, TargetAudience, ArticleLength
+from app.services.cache import CacheMode, NullCache, ResponseCache, cache_key
 
 
 # Import settings
@@ -132,12 +133,12 @@ class SystemPromptBuilder:
         return prompt
 
 
-def read_news_json_file(file_path: str) -> List[News]:
+def iter_news_json_file(file_path: str) -> Iterator[News]:
     with open(file_path, 'r', encoding='utf-8') as f:
         data = json.load(f)
 
-    news_list: List[News] = []
     for item in data:
+        id = item['id']
         title = item['title']
         content = item['title']
         authors = [ author['name'] for author in item['authors']]
@@ -151,10 +152,11 @@ def read_news_json_file(file_path: str) -> List[News]:
 
         news_data = NewsData(summary=summary, keywords=keywords, facts=facts, important_dates=important_dates)
 
-        news_item = News(title=title, content=content, authors=authors, published=published, extracted_data=news_data)
-        news_list.append(news_item)
+        yield News(id=id, title=title, content=content, authors=authors, published=published, extracted_data=news_data)
+
 
-    return news_list
+def read_news_json_file(file_path: str) -> List[News]:
+    return list(iter_news_json_file(file_path))
 
 
 def prepare_input(news_list: List[News]) -> str:
@@ -168,7 +170,10 @@ def prepare_input(news_list: List[News]) -> str:
     return "\n\n".join(input)
 
 
-def generate_article(llm: AzureOpenAI, prefs: UserPreferences, news_list: List[News]) -> GenArticle:
+def build_prompts(prefs: UserPreferences, news_list: List[News]) -> tuple[str, str]:
+    """
+    build the system and user prompt for the given preferences and news
+    """
     system_prompt = SystemPromptBuilder() \
         .with_tone(prefs.tone) \
         .with_style(prefs.style) \
@@ -180,6 +185,27 @@ def generate_article(llm: AzureOpenAI, prefs: UserPreferences, news_list: List[N
 
     model_input = prepare_input(news_list)
     user_prompt = f"Write an article based on the following news:\n\n{model_input}"
+    return system_prompt, user_prompt
+
+
+def generation_cache_key(llm: LLM, system_prompt: str, user_prompt: str) -> str:
+    # same prompts, model and temperature produce an interchangeable article
+    return cache_key(system_prompt, user_prompt, llm.metadata.model_name, getattr(llm, "temperature", None))
+
+
+def generate_article(
+    llm: AzureOpenAI,
+    prefs: UserPreferences,
+    news_list: List[News],
+    cache: ResponseCache = NullCache(),
+    cache_mode: CacheMode = CacheMode.use,
+) -> GenArticle:
+    system_prompt, user_prompt = build_prompts(prefs, news_list)
+
+    key = generation_cache_key(llm, system_prompt, user_prompt)
+    cached = cache.get(key, cache_mode)
+    if cached is not None:
+        return GenArticle.model_validate_json(cached)
 
     sllm: StructuredLLM = llm.as_structured_llm(output_cls=GenArticle)
     response: ChatResponse = sllm.chat(
@@ -193,5 +219,119 @@ def generate_article(llm: AzureOpenAI, prefs: UserPreferences, news_list: List[N
     if content is None:
         raise ValueError('Model output is invalid: does not contain content')
 
-    return GenArticle.model_validate_json(content)
+    article = GenArticle.model_validate_json(content)
+    cache.set(key, article.model_dump_json())
+    return article
+
 
+# Streaming generation: the model writes the article as plain JSON text, keys in this order
+# so the title and headers arrive first and the paragraphs follow one by one
+_stream_format_prompt = (
+    " Respond only with a JSON object with the keys \"title\" (string), \"headers\" (list of strings) "
+    "and \"paragraphs\" (list of strings, one paragraph per header), written in exactly this order."
+)
+
+class GenArticleStreamParser:
+    """
+    Incrementally scans the streamed JSON text of a GenArticle and returns every
+    string value as soon as it is complete: (key, index in the list or None, value)
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._expect_key = True
+        self._key: Optional[str] = None
+        self._counts: Dict[str, int] = {}
+
+    def feed(self, delta: str) -> List[tuple[str, Optional[int], str]]:
+        self.text += delta
+        values = []
+        while self._pos < len(self.text):
+            char = self.text[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    value = json.loads(self.text[self._string_start:self._pos + 1])
+                    if self._depth == 1 and self._expect_key:
+                        self._key = value
+                    elif self._depth == 1:
+                        values.append((self._key, None, value))
+                    elif self._depth == 2 and self._key is not None:
+                        index = self._counts.get(self._key, 0)
+                        self._counts[self._key] = index + 1
+                        values.append((self._key, index, value))
+            elif char == '"':
+                self._in_string = True
+                self._string_start = self._pos
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._expect_key = True
+            elif char in "}]":
+                self._depth -= 1
+            elif char == ":" and self._depth == 1:
+                self._expect_key = False
+            elif char == "," and self._depth == 1:
+                self._expect_key = True
+            self._pos += 1
+        return values
+
+    def json_text(self) -> str:
+        # drop anything around the object, e.g. markdown code fences
+        return self.text[self.text.find("{"):self.text.rfind("}") + 1]
+
+
+async def stream_article(
+    llm: LLM,
+    prefs: UserPreferences,
+    news_list: List[News],
+    cache: ResponseCache = NullCache(),
+    cache_mode: CacheMode = CacheMode.use,
+) -> AsyncGenerator[tuple[str, dict], None]:
+    """
+    stream the article as (event, data) pairs: title, header and paragraph events while the
+    model is writing, and a final done event with the complete GenArticle
+    """
+    system_prompt, user_prompt = build_prompts(prefs, news_list)
+
+    key = generation_cache_key(llm, system_prompt, user_prompt)
+    cached = await cache.aget(key, cache_mode)
+    if cached is not None:
+        article = GenArticle.model_validate_json(cached)
+        yield "title", {"title": article.title}
+        for index, header in enumerate(article.headers):
+            yield "header", {"index": index, "text": header}
+        for index, paragraph in enumerate(article.paragraphs):
+            yield "paragraph", {"index": index, "text": paragraph}
+        yield "done", article.model_dump()
+        return
+
+    parser = GenArticleStreamParser()
+    response_gen = await llm.astream_chat(
+        [
+            ChatMessage(role=MessageRole.SYSTEM, content=system_prompt + _stream_format_prompt),
+            ChatMessage(role=MessageRole.USER, content=user_prompt)
+        ]
+    )
+    async for response in response_gen:
+        for field, index, value in parser.feed(response.delta or ""):
+            match field:
+                case "title":
+                    yield "title", {"title": value}
+                case "headers":
+                    yield "header", {"index": index, "text": value}
+                case "paragraphs":
+                    yield "paragraph", {"index": index, "text": value}
+
+    article = GenArticle.model_validate_json(parser.json_text())
+    await cache.aset(key, article.model_dump_json())
+    yield "done", article.model_dump()
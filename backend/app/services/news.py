@@ -0,0 +1,49 @@
+from typing import Dict, List, Optional
+import os
+import threading
+
+from app.models.generate import News
+from app.services.generate import iter_news_json_file
+
+
+class NewsStore:
+    """
+    Keeps the parsed news corpus in memory, indexed by article id.
+    The file is only parsed again when its mtime or size changes.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._stamp: Optional[tuple[int, int]] = None
+        self._news: Dict[str, News] = {}
+
+    def _index(self) -> Dict[str, News]:
+        stat = os.stat(self.file_path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    self._news = {news.id: news for news in iter_news_json_file(self.file_path)}
+                    self._stamp = stamp
+        return self._news
+
+    def load(self):
+        self._index()
+
+    def get_all(self) -> List[News]:
+        return list(self._index().values())
+
+    def get_many(self, ids: List[str]) -> tuple[List[News], List[str]]:
+        """
+        returns the news for the given ids (in request order) and the ids that are not in the corpus,
+        each id at most once
+        """
+        index = self._index()
+        ids = list(dict.fromkeys(ids))
+        found = [index[id] for id in ids if id in index]
+        missing = [id for id in ids if id not in index]
+        return found, missing
+
+
+news_store = NewsStore("./rss_feed_entries_2.json")
@@ -27,18 +27,48 @@ class Settings(BaseSettings):
     AZURE_OPENAI_API_VERSION: str = os.getenv("AZURE_OPENAI_API_VERSION", "2024-08-01-preview")
     AZURE_OPENAI_EMBEDDING_MODEL: str = os.getenv("AZURE_OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
 
+    # Streams a canned article instead of calling the model (local testing of /generate/article/stream)
+    USE_FAKE_LLM: bool = os.getenv("USE_FAKE_LLM", False)
+
+    # Response caches: "memory" (per process LRU), "sqlite" (on disk, shared) or "none"
+    GENERATION_CACHE_BACKEND: str = os.getenv("GENERATION_CACHE_BACKEND", "memory")
+    GENERATION_CACHE_MAXSIZE: int = os.getenv("GENERATION_CACHE_MAXSIZE", 256)
+    GENERATION_CACHE_TTL: int = os.getenv("GENERATION_CACHE_TTL", 24 * 60 * 60)
+    CACHE_SQLITE_PATH: str = os.getenv("CACHE_SQLITE_PATH", "./local_data_cache/cache.sqlite3")
+
+    # Seconds /evaluate waits for the concurrent metric evaluations
+    EVALUATION_TIMEOUT: float = os.getenv("EVALUATION_TIMEOUT", 30)
+    EVALUATION_MAX_TIMEOUT: float = os.getenv("EVALUATION_MAX_TIMEOUT", 120)  # upper bound of the timeout a client may ask for
+    EVALUATION_BATCH_CONCURRENCY: int = os.getenv("EVALUATION_BATCH_CONCURRENCY", 8)  # texts evaluated at the same time by /evaluate/batch
+    EVALUATION_CACHE_BACKEND: str = os.getenv("EVALUATION_CACHE_BACKEND", "sqlite")
+    EVALUATION_CACHE_MAXSIZE: int = os.getenv("EVALUATION_CACHE_MAXSIZE", 4096)
+    EVALUATION_CACHE_TTL: int = os.getenv("EVALUATION_CACHE_TTL", 30 * 24 * 60 * 60)
+
     # Postgres Database settings
     DB_CONNECTION_NAME: str = os.getenv("DB_CONNECTION_NAME", "")
     DB_USER: str = os.getenv("DB_USER", "user")
     DB_PASS: str = os.getenv("DB_PASS", "password")
-    DB_HOST: str = os.getenv("DB_HOST", "localhost")
+    DB_HOST: str = os.getenv("DB_HOST", "localhost")  # hostname, or socket directory when starting with "/"
+    DB_PORT: int = os.getenv("DB_PORT", 5432)
     DB_NAME: str = os.getenv("DB_NAME", "your_database")
+    DB_ASYNC_URL: str = os.getenv("DB_ASYNC_URL", "")  # e.g. sqlite+aiosqlite:///./local.db for local tests
+
+    # Postgres connection pool settings
+    DB_POOL_SIZE: int = os.getenv("DB_POOL_SIZE", 5)
+    DB_MAX_OVERFLOW: int = os.getenv("DB_MAX_OVERFLOW", 10)
+    DB_POOL_TIMEOUT: float = os.getenv("DB_POOL_TIMEOUT", 30)
+    DB_POOL_RECYCLE: int = os.getenv("DB_POOL_RECYCLE", 1800)
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", True)
+    DB_POOL_WARMUP: int = os.getenv("DB_POOL_WARMUP", 2)
 
     # QDrant Vector Database
     QDRANT_HOST: str = os.getenv("QDRANT_HOST", "")
     QDRANT_PORT: str = os.getenv("QDRANT_PORT", "")
     QDRANT_API_KEY: str = os.getenv("QDRANT_API_KEY", "")
     
+    # SQLite state of the online clusterer, /cluster serves its live clusters instead of clusters.json when set
+    CLUSTER_STATE_PATH: str = os.getenv("CLUSTER_STATE_PATH", "")
+
     SERPER_API_KEY: str = os.getenv("SERPER_API_KEY", "")
 # Exporting for use
 settings = Settings()
@@ -0,0 +1,78 @@
+"""
+Load test for the article endpoints: requests/sec and latency at a given concurrency.
+
+Run it against the server before and after a change, e.g.
+
+    uvicorn app.main:app --workers 1
+    python scripts/bench_articles.py --url http://127.0.0.1:8000 --concurrency 200 --requests 5000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+import httpx
+
+
+async def seed(client: httpx.AsyncClient, count: int) -> List[int]:
+    ids = []
+    for idx in range(count):
+        response = await client.post("/articles/", json={
+            "content": {"title": f"Benchmark article {idx}", "paragraphs": ["Lorem ipsum " * 50], "headers": ["Header"]},
+        })
+        response.raise_for_status()
+        ids.append(response.json()["id"])
+    return ids
+
+
+async def run(url: str, concurrency: int, total: int, seed_count: int):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        ids = await seed(client, seed_count)
+
+        paths = [
+            f"/articles/{ids[idx % len(ids)]}" if idx % 2 else "/articles/?limit=20&fields=id,title,created_at"
+            for idx in range(total)
+        ]
+        latencies: List[float] = []
+        errors = 0
+        queue: asyncio.Queue = asyncio.Queue()
+        for path in paths:
+            queue.put_nowait(path)
+
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                path = queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+
+        await client.request("DELETE", "/articles/bulk", json={"article_ids": ids})
+
+    latencies.sort()
+    print(f"requests:    {total} (errors: {errors})")
+    print(f"concurrency: {concurrency}")
+    print(f"req/s:       {total / elapsed:.1f}")
+    print(f"p50 / p99:   {statistics.median(latencies) * 1000:.1f} ms / {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=50, help="number of articles created before the run")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.url, args.concurrency, args.requests, args.seed))
@@ -0,0 +1,31 @@
+import os
+import tempfile
+
+import pytest
+
+# The settings are read when app is imported, the article routes run against a local SQLite file
+os.environ["DB_ASYNC_URL"] = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'articles.db')}"
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.db_connection import async_engine
+from app.models.article import Base, create_tables
+from app.routers import article
+
+
+async def reset_tables():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await create_tables(conn)
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(article.router)
+    with TestClient(app) as client:
+        client.portal.call(reset_tables)
+        yield client
+        # pooled aiosqlite connections belong to this client's event loop
+        client.portal.call(async_engine.dispose)
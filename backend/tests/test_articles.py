@@ -0,0 +1,57 @@
+def make_article(number: int) -> dict:
+    return {
+        "content": {"title": f"Article {number}", "paragraphs": [f"Paragraph of article {number}."], "headers": ["Header"]},
+        "news_data": None,
+    }
+
+
+def create_articles(client, count: int) -> list:
+    response = client.post("/articles/bulk", json={"articles": [make_article(number) for number in range(count)]})
+    assert response.status_code == 200
+    return response.json()
+
+
+def list_all(client, **params) -> list:
+    pages = []
+    cursor = None
+    while True:
+        response = client.get("/articles/", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+
+
+def test_cursor_pagination_returns_every_article_once_newest_first(client):
+    created = create_articles(client, 7)
+
+    pages = list_all(client, limit=3)
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    ids = [item["id"] for page in pages for item in page]
+    # the bulk insert gives every row the same created_at, the id breaks the tie
+    assert ids == sorted((article["id"] for article in created), reverse=True)
+
+
+def test_last_full_page_has_no_next_cursor(client):
+    create_articles(client, 4)
+
+    response = client.get("/articles/", params={"limit": 4})
+
+    assert len(response.json()) == 4
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_fields_projection_only_returns_the_requested_fields(client):
+    create_articles(client, 2)
+
+    items = client.get("/articles/", params={"fields": "title"}).json()
+
+    assert [set(item) for item in items] == [{"id", "title", "created_at"}] * 2
+    assert {item["title"] for item in items} == {"Article 0", "Article 1"}
+
+
+def test_invalid_cursor_and_unknown_fields_are_rejected(client):
+    assert client.get("/articles/", params={"cursor": "not-a-cursor"}).status_code == 400
+    assert client.get("/articles/", params={"fields": "title,secret"}).status_code == 400
@@ -0,0 +1,33 @@
+from test_articles import create_articles, make_article
+
+
+def test_bulk_create_returns_the_new_articles_in_order(client):
+    created = create_articles(client, 3)
+
+    assert [article["content"]["title"] for article in created] == ["Article 0", "Article 1", "Article 2"]
+    assert len({article["id"] for article in created}) == 3
+    assert client.get(f"/articles/{created[1]['id']}").json()["content"]["title"] == "Article 1"
+
+
+def test_bulk_create_of_nothing_returns_an_empty_list(client):
+    assert client.post("/articles/bulk", json={"articles": []}).json() == []
+
+
+def test_bulk_delete_only_reports_the_deleted_ids(client):
+    created = create_articles(client, 3)
+    ids = [article["id"] for article in created]
+
+    response = client.request("DELETE", "/articles/bulk", json={"article_ids": [ids[0], ids[2], 999]})
+
+    assert response.status_code == 200
+    assert sorted(response.json()["deleted_ids"]) == [ids[0], ids[2]]
+    assert [item["id"] for item in client.get("/articles/").json()] == [ids[1]]
+
+
+def test_bulk_delete_of_unknown_ids_is_not_found(client):
+    client.post("/articles/", json=make_article(0))
+
+    response = client.request("DELETE", "/articles/bulk", json={"article_ids": [998, 999]})
+
+    assert response.status_code == 404
+    assert len(client.get("/articles/").json()) == 1
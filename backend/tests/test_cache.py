@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.cache import CacheMode, SQLiteCache, cache_key, make_cache
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    return make_cache(request.param, namespace="test", maxsize=100, ttl=60, path=str(tmp_path / "cache.sqlite3"))
+
+
+def test_cache_key_depends_on_every_part():
+    assert cache_key("prompt", "model", 0.7) == cache_key("prompt", "model", 0.7)
+    assert cache_key("prompt", "model", 0.7) != cache_key("prompt", "model", 0.2)
+
+
+def test_get_set_and_bypass(cache):
+    assert cache.get("key") is None
+    cache.set("key", "value")
+
+    assert cache.get("key") == "value"
+    assert cache.get("key", CacheMode.bypass) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["bypasses"], stats["writes"]) == (1, 1, 1, 1)
+
+
+def test_get_many_leaves_out_missing_keys(cache):
+    cache.set("a", "1")
+    cache.set("c", "3")
+
+    assert cache.get_many(["a", "b", "c"]) == {"a": "1", "c": "3"}
+    assert cache.get_many(["a"], CacheMode.bypass) == {}
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (2, 1)
+
+
+def test_async_access(cache):
+    async def roundtrip():
+        await cache.aset("key", "value")
+        return await cache.aget("key"), await cache.aget_many(["key", "other"])
+
+    assert asyncio.run(roundtrip()) == ("value", {"key": "value"})
+
+
+def test_sqlite_entries_expire_and_survive_a_new_instance(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    SQLiteCache(path, namespace="test", ttl=60).set("key", "value")
+
+    assert SQLiteCache(path, namespace="test", ttl=60).get("key") == "value"
+    assert SQLiteCache(path, namespace="test", ttl=-1).get("key") is None
+    assert SQLiteCache(path, namespace="other", ttl=60).get("key") is None
+
+
+def test_sqlite_get_many_spans_several_queries(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), namespace="test", ttl=60)
+    for number in range(0, cache.max_keys_per_query * 2, 2):
+        cache.set(str(number), str(number))
+
+    values = cache.get_many([str(number) for number in range(cache.max_keys_per_query * 2)])
+
+    assert len(values) == cache.max_keys_per_query
+    assert values["998"] == "998"
+
+
+def test_sqlite_cache_from_several_threads(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), namespace="test", ttl=60)
+
+    def write(thread: int):
+        for number in range(20):
+            cache.set(f"{thread}-{number}", "value")
+
+    threads = [threading.Thread(target=write, args=(thread,)) for thread in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(cache.get_many([f"{thread}-{number}" for thread in range(4) for number in range(20)])) == 80
+    assert cache.stats()["writes"] == 80
@@ -0,0 +1,76 @@
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import clusters
+from app.services.clusters import ClusterStore
+
+CLUSTERS = [
+    {
+        "title": "Story",
+        "image": "",
+        "cluster": [{"title": "Article", "content": "full text", "rss_summary": "<p>html</p>", "link": "https://example.com"}],
+    }
+]
+
+
+@pytest.fixture
+def clusters_file(tmp_path):
+    path = tmp_path / "clusters.json"
+    path.write_text(json.dumps(CLUSTERS), encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def cluster_client(monkeypatch, clusters_file):
+    monkeypatch.setattr(clusters, "cluster_store", ClusterStore(str(clusters_file)))
+    app = FastAPI()
+    app.include_router(clusters.router)
+    return TestClient(app)
+
+
+def test_matching_etag_is_not_modified(cluster_client):
+    first = cluster_client.get("/cluster/", headers={"Accept-Encoding": "identity"})
+
+    second = cluster_client.get("/cluster/", headers={"Accept-Encoding": "identity", "If-None-Match": first.headers["etag"]})
+
+    assert first.status_code == 200
+    assert first.json() == {"status": "success", "data": CLUSTERS}
+    assert second.status_code == 304
+    assert second.content == b""
+
+
+def test_gzip_body_has_its_own_etag(cluster_client):
+    plain = cluster_client.get("/cluster/", headers={"Accept-Encoding": "identity"})
+
+    response = cluster_client.get("/cluster/", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] != plain.headers["etag"]
+    assert response.json() == plain.json()
+    assert json.loads(gzip.decompress(clusters.cluster_store.get().gzip_body)) == plain.json()
+
+
+def test_summary_view_drops_the_article_texts(cluster_client):
+    article = cluster_client.get("/cluster/", params={"view": "summary"}).json()["data"][0]["cluster"][0]
+
+    assert article == {"title": "Article", "link": "https://example.com"}
+
+
+def test_changed_file_is_served_with_a_new_etag(cluster_client, clusters_file):
+    before = cluster_client.get("/cluster/").headers["etag"]
+
+    clusters_file.write_text(json.dumps(CLUSTERS + CLUSTERS), encoding="utf-8")
+    response = cluster_client.get("/cluster/", headers={"If-None-Match": before})
+
+    assert response.status_code == 200
+    assert len(response.json()["data"]) == 2
+
+
+def test_missing_file_is_reported(cluster_client, clusters_file):
+    clusters_file.unlink()
+
+    assert cluster_client.get("/cluster/").json() == {"status": "error", "message": "No clusters found"}
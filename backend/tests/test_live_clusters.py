@@ -0,0 +1,46 @@
+import json
+import sqlite3
+
+import pytest
+
+from app.services.clusters import ClusterStateError, ClusterView, LiveClusterStore
+
+
+def publish(path, version: int, clusters):
+    # the snapshot table of notebooks/online_clustering.py
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS snapshot (id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER NOT NULL, body TEXT NOT NULL)")
+        conn.execute("INSERT OR REPLACE INTO snapshot (id, version, body) VALUES (0, ?, ?)", (version, json.dumps(clusters)))
+    conn.close()
+
+
+def test_bodies_are_rebuilt_when_a_new_version_is_published(tmp_path):
+    path = tmp_path / "clusters.sqlite3"
+    publish(path, 1, [{"title": "First", "cluster": [{"title": "a", "content": "text"}], "image": ""}])
+    store = LiveClusterStore(str(path))
+
+    first = store.get()
+    assert store.get() is first
+    assert json.loads(store.get(ClusterView.summary).body)["data"][0]["cluster"] == [{"title": "a"}]
+
+    publish(path, 2, [])
+    assert json.loads(store.get().body) == {"status": "success", "data": []}
+    assert store.get().etag != first.etag
+
+
+def test_nothing_published_is_not_found(tmp_path):
+    path = tmp_path / "clusters.sqlite3"
+    sqlite3.connect(path).close()
+
+    with pytest.raises(FileNotFoundError):
+        LiveClusterStore(str(tmp_path / "missing.sqlite3")).get()
+    with pytest.raises(FileNotFoundError):
+        LiveClusterStore(str(path)).get()
+
+
+def test_unreadable_state_raises_cluster_state_error(tmp_path):
+    path = tmp_path / "clusters.sqlite3"
+    path.write_bytes(b"not a database" * 100)
+
+    with pytest.raises(ClusterStateError):
+        LiveClusterStore(str(path)).get()
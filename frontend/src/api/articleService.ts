@@ -7,9 +7,18 @@ import {
 } from "@/types/articles";
 import { apiClient } from "./axoisConfig";
 
+// GET /articles is paginated, the next page's cursor comes in the X-Next-Cursor header
 export const fetchArticles = async (): Promise<ArticleResponse[]> => {
-  const { data } = await apiClient.get<ArticleResponse[]>("/articles");
-  return data;
+  const articles: ArticleResponse[] = [];
+  let cursor: string | undefined;
+  do {
+    const response = await apiClient.get<ArticleResponse[]>("/articles", {
+      params: { limit: 200, cursor },
+    });
+    articles.push(...response.data);
+    cursor = response.headers["x-next-cursor"];
+  } while (cursor);
+  return articles;
 };
 
 export const fetchArticleById = async (
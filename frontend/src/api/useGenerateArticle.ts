@@ -4,6 +4,7 @@ import axios from "axios";
 
 interface GenerateArticleRequest {
   articles_ids: string[];
+  use_all_news?: boolean;
   user_prefs: {
     tone: "opinionated" | "neutral";
     style: "casual" | "formal";
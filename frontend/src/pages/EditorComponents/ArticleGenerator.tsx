@@ -30,7 +30,8 @@ export default function ArticleGenerator({ onGenerate }: Props) {
         import.meta.env.VITE_BACKEND_ARTICLE_ENDPOINT,
 
         {
-          articles_ids: ["string"], // You might want to update this based on your needs
+          articles_ids: [],
+          use_all_news: true, // the editor has no article selection, generate from the whole news corpus
           user_prefs: {
             tone,
             style,
@@ -0,0 +1,118 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from newspaper import Article
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; TensorboltFeedReader/1.0)",
+}
+
+# Status codes worth retrying, everything else is returned/raised immediately
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class ArticleFetcher:
+    """
+    Downloads article pages concurrently with a bounded thread pool.
+
+    - at most `per_host_limit` requests run against the same host at a time
+    - every worker thread keeps its own requests.Session, so connections are reused
+    - requests time out after `timeout` seconds and are retried `retries` times with exponential backoff
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 16,
+        per_host_limit: int = 4,
+        timeout: float = 10.0,
+        retries: int = 2,
+        backoff: float = 0.5,
+    ):
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+        self._local = threading.local()
+        self._host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._host_lock = threading.Lock()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.per_host_limit, pool_maxsize=self.per_host_limit)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update(DEFAULT_HEADERS)
+            self._local.session = session
+        return session
+
+    def _host_semaphore(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc
+        with self._host_lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_semaphores[host]
+
+    def fetch_html(self, url: str) -> str:
+        """
+        Download the page, retrying timeouts, connection errors and retryable status codes.
+        """
+        attempt = 0
+        while True:
+            try:
+                with self._host_semaphore(url):
+                    response = self._session().get(url, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return response.text
+                error: Exception = requests.HTTPError(f"{response.status_code} for {url}", response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+
+            if attempt >= self.retries:
+                raise error
+            # exponential backoff with jitter, outside of the host slot
+            time.sleep(self.backoff * (2 ** attempt) * (1 + random.random()))
+            attempt += 1
+
+    def fetch_article_text(self, url: str) -> Optional[str]:
+        """
+        Download the page and extract its main content, None if the download or the parsing failed
+        (an empty string is a page without article text).
+        """
+        try:
+            html = self.fetch_html(url)
+            article = Article(url)
+            article.download(input_html=html)
+            article.parse()
+            return article.text
+        except Exception as e:
+            print(f"Failed to extract article content from {url}: {e}")
+            return None
+
+    def iter_fetch(self, urls: Iterable[str]) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        Yield (url, text) as soon as each page is downloaded and parsed, in completion order,
+        text is None for pages that failed.
+        """
+        urls = list(dict.fromkeys(url for url in urls if url))
+        if not urls:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls))) as executor:
+            futures = {executor.submit(self.fetch_article_text, url): url for url in urls}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def fetch_all(self, urls: Iterable[str]) -> Dict[str, Optional[str]]:
+        return dict(self.iter_fetch(urls))
+
@@ -0,0 +1,96 @@
+"""
+Batch clustering (mini-batch k-means over the stored vectors) against the greedy popular-article
+clusters as the corpus grows.
+
+For every size in `--sizes`, indexes synthetic articles from `size / --articles-per-topic` topics
+(each with its own vocabulary, the first ones are the bench_clustering topics) into a
+LocalVectorBackend with a local hashing embed model, then builds the top `--m` clusters both ways
+and reports the run time, how many articles are in more than one cluster, and the purity (share of
+cluster members from the cluster's most common topic).
+
+    python bench_batch_clustering.py --sizes 1000 10000 100000
+    python bench_batch_clustering.py --sizes 2000 --dim 3072
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+
+from bench_clustering import TOPICS, CountingClient, HashingEmbedding
+from database_manager import IndexBuilder
+from document_store import DocumentStore
+from vector_backends import LocalVectorBackend
+
+
+def topic_articles(count: int, articles_per_topic: int, seed: int = 1):
+    rng = random.Random(seed)
+    vocabularies = [words.split() for words in TOPICS.values()]
+    vocabularies += [
+        [f"topic{topic}word{idx}" for idx in range(12)]
+        for topic in range(len(vocabularies), max(len(vocabularies), count // articles_per_topic))
+    ]
+    articles = []
+    for idx in range(count):
+        topic = rng.randrange(len(vocabularies))
+        summary = " ".join([rng.choice(vocabularies[topic]) for _ in range(30)] + [f"word{rng.randrange(5000)}" for _ in range(5)])
+        articles.append({
+            "id": f"article-{idx}",
+            "title": f"topic {topic} story {idx}",
+            "media_content": [{"url": f"https://example.com/{idx}.jpg"}],
+            "extracted_data": {"summary": summary},
+        })
+    return articles
+
+
+def describe(clusters):
+    members = Counter(article["id"] for cluster in clusters for article in cluster)
+    topics = [Counter(article["title"].split(" story ")[0] for article in cluster) for cluster in clusters]
+    purity = sum(max(counts.values()) for counts in topics) / max(1, sum(sum(counts.values()) for counts in topics))
+    return sum(1 for count in members.values() if count > 1), purity
+
+
+def run(size: int, args, workdir: str):
+    embed_model = HashingEmbedding(model_name="hashing", dim=args.dim, latency=0.0)
+    counter = CountingClient(LocalVectorBackend(os.path.join(workdir, f"vectors-{size}")))
+    builder = IndexBuilder(collection_name="bench", embed_model=embed_model, vector_backend=counter,
+                           document_store=DocumentStore(os.path.join(workdir, f"documents-{size}.sqlite3")))
+    builder.process_documents(topic_articles(size, args.articles_per_topic))
+    builder.build_index()
+    # the IVF index is built before timing (no-op below the exact search threshold)
+    counter.build_index()
+
+    counter.requests = 0
+    start = time.perf_counter()
+    greedy = builder.build_popular_clusters(args.n, args.k, args.m)
+    greedy_time = time.perf_counter() - start
+    greedy_requests = counter.requests
+
+    start = time.perf_counter()
+    vectors, _ = builder.load_recent_vectors(max_age_days=None)
+    load_time = time.perf_counter() - start
+    start = time.perf_counter()
+    batch = builder.build_batch_clusters(m=args.m, max_articles=args.k, max_age_days=None)
+    batch_time = time.perf_counter() - start
+
+    print(f"{size:>7} articles  greedy: {greedy_time:6.2f}s, {greedy_requests} search requests, "
+          f"{describe(greedy)[0]} articles in several clusters, purity {describe(greedy)[1]:.2f}")
+    print(f"{'':17}batch:  {batch_time:6.2f}s (reading {vectors.shape[0]} vectors {load_time:.2f}s), "
+          f"{describe(batch)[0]} articles in several clusters, purity {describe(batch)[1]:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--articles-per-topic", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--n", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--m", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"dim={args.dim}, n={args.n} k={args.k} m={args.m}, {args.articles_per_topic} articles per topic")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            run(size, args, workdir)
@@ -0,0 +1,159 @@
+"""
+Run-time comparison of the popular-article clustering modes.
+
+Indexes `--articles` synthetic articles into Qdrant (in memory, or the server at `--url`), or into a
+LocalVectorBackend directory (`--local`), with a
+local hashing embed model that sleeps `--latency` seconds per call to stand in for the embedding API,
+then builds the clusters of IndexBuilder.retrieve_clusters_top_m_popular_articles (without the LLM
+titles) re-embedding every hit, using the vectors returned with the hits, and additionally sending
+all neighbor searches of a pass as one search_batch request.
+
+    python bench_clustering.py --articles 2000 --n 10 --k 5 --m 3 --latency 0.05
+    python bench_clustering.py --url http://localhost:6333 --n 50 --k 10 --m 5
+    python bench_clustering.py --local ./local_vectors --n 50 --k 10 --m 5
+"""
+import argparse
+import hashlib
+import random
+import re
+import shutil
+import time
+from typing import List
+
+import numpy as np
+import qdrant_client
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+from database_manager import IndexBuilder
+from document_store import DocumentStore
+from vector_backends import LocalVectorBackend
+
+TOPICS = {
+    "ev": "electric car battery charging range tesla kia ev6 charger kwh motor",
+    "bikes": "motorcycle bmw engine rider handlebar fork wheels triumph helmet",
+    "roads": "motorway traffic pothole council drivers roads police collision ice",
+    "industry": "northvolt factory jobs bankruptcy investment carmakers europe tariff",
+    "yachts": "superyacht sailing mallorca bezos harbour crew vessel billionaire",
+}
+
+
+class HashingEmbedding(BaseEmbedding):
+    """bag of words hashed into `dim` buckets, every call sleeps `latency` seconds"""
+
+    dim: int = 256
+    latency: float = 0.05
+    calls: int = 0
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._get_text_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_text_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return self._embed(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+
+def synthetic_articles(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    articles = []
+    for idx in range(count):
+        topic = rng.choice(list(TOPICS))
+        words = TOPICS[topic].split()
+        # a few rare words per article, so scores do not tie
+        summary = " ".join([rng.choice(words) for _ in range(30)] + [f"word{rng.randrange(5000)}" for _ in range(5)])
+        articles.append({
+            "id": f"article-{idx}",
+            "title": f"{topic} story {idx}",
+            "media_content": [{"url": f"https://example.com/{idx}.jpg"}],
+            "extracted_data": {"summary": summary},
+        })
+    return articles
+
+
+class CountingClient:
+    """counts the search requests sent to the wrapped Qdrant client or vector backend"""
+
+    def __init__(self, client):
+        self._client = client
+        self.requests = 0
+
+    def search(self, *args, **kwargs):
+        self.requests += 1
+        return self._client.search(*args, **kwargs)
+
+    def search_batch(self, *args, **kwargs):
+        self.requests += 1
+        return self._client.search_batch(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def run(builder: IndexBuilder, embed_model: HashingEmbedding, counter: CountingClient, args, use_stored_vectors: bool, batch_search: bool):
+    builder.use_stored_vectors = use_stored_vectors
+    builder.batch_search = batch_search
+    embed_model.calls = 0
+    counter.requests = 0
+    start = time.perf_counter()
+    clusters = builder.build_popular_clusters(args.n, args.k, args.m)
+    elapsed = time.perf_counter() - start
+    # members only, scores that differ in the last float32 bits may swap neighbors within a cluster
+    return elapsed, embed_model.calls, counter.requests, [sorted(a["id"] for a in cluster) for cluster in clusters]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=2000)
+    parser.add_argument("--n", type=int, default=10)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--m", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--url", default=None, help="Qdrant server url, in memory if not set")
+    parser.add_argument("--local", default=None, help="directory of a LocalVectorBackend to use instead of Qdrant")
+    args = parser.parse_args()
+
+    embed_model = HashingEmbedding(model_name="hashing", latency=0.0)
+    document_store = DocumentStore(":memory:")
+    if args.local:
+        shutil.rmtree(args.local, ignore_errors=True)
+        counter = CountingClient(LocalVectorBackend(args.local))
+        builder = IndexBuilder(collection_name="bench", embed_model=embed_model, vector_backend=counter,
+                               document_store=document_store)
+    else:
+        counter = CountingClient(qdrant_client.QdrantClient(url=args.url) if args.url else qdrant_client.QdrantClient(":memory:"))
+        if args.url and counter.collection_exists("bench"):
+            counter.delete_collection("bench")
+        builder = IndexBuilder(collection_name="bench", client=counter, embed_model=embed_model,
+                               document_store=document_store)
+    builder.process_documents(synthetic_articles(args.articles))
+    builder.build_storage_context()
+    builder.build_index()
+    embed_model.latency = args.latency
+
+    print(f"articles: {args.articles}, n={args.n} k={args.k} m={args.m}, {args.latency}s per embedding call, "
+          f"vector store: {args.local or args.url or 'in-memory qdrant'}")
+    results = {}
+    for name, use_stored_vectors, batch_search in [
+        ("re-embedding", False, False),
+        ("stored vectors", True, False),
+        ("stored + batch", True, True),
+    ]:
+        elapsed, calls, requests, clusters = run(builder, embed_model, counter, args, use_stored_vectors, batch_search)
+        results[name] = clusters
+        print(f"{name + ':':16}{elapsed:.3f}s, {calls} embedding calls, {requests} search requests")
+    print(f"same clusters:  {len({str(clusters) for clusters in results.values()}) == 1}")
@@ -0,0 +1,49 @@
+"""
+Benchmark of single-article and batched LLM extraction over already scraped articles.
+
+Takes the article contents of the given rss_feed_entries_*.json / .jsonl files, extracts them once
+with one call per article and once in batches packed up to `--budget` tokens, and reports
+tokens/article and articles/minute of both runs. Calls the configured Azure OpenAI deployment.
+
+    python bench_extraction.py rss_feed_entries_1.json --limit 20 --budget 6000
+"""
+import argparse
+from itertools import islice
+
+from data_processor import RSSParser, TokenBatcher
+from jsonl_store import iter_entries
+
+
+def pack(contents, budget, max_batch_size, preprocessor):
+    batcher = TokenBatcher(budget, max_batch_size)
+    for content in contents:
+        batch = batcher.add(content, preprocessor.input_tokens(content))
+        if batch:
+            yield batch
+    batch = batcher.flush()
+    if batch:
+        yield batch
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--budget", type=int, default=6000)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    entries = (entry for path in args.files for entry in iter_entries(path))
+    contents = [entry["content"] for entry in islice((e for e in entries if len(e.get("content", "")) > 500), args.limit)]
+
+    single = RSSParser("")
+    for content in contents:
+        single.extract_structured_data(content)
+
+    batched = RSSParser("", batch_token_budget=args.budget, max_batch_size=args.max_batch_size)
+    for batch in pack(contents, args.budget, args.max_batch_size, batched.preprocessor):
+        batched.extract_structured_data_batch(batch)
+
+    print(f"articles: {len(contents)}")
+    print(f"single:  {single.stats.report()}")
+    print(f"batched: {batched.stats.report()}")
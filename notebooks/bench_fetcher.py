@@ -0,0 +1,86 @@
+"""
+Benchmark of the article fetch stage against a local HTTP fixture server.
+
+Serves `--articles` generated article pages spread over `--hosts` local servers (one port per host),
+every response delayed by `--latency` seconds, and compares serial downloads with ArticleFetcher.
+
+    python bench_fetcher.py --articles 50 --hosts 5 --latency 0.3
+"""
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from article_fetcher import ArticleFetcher
+
+PARAGRAPH = (
+    "Electric cars keep getting cheaper as battery prices fall and more manufacturers launch compact models. "
+    "Analysts expect the price gap to petrol cars to close within the next years in most European markets. "
+)
+
+
+def make_handler(latency: float):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is measurable
+
+        def do_GET(self):
+            time.sleep(latency)
+            body = (
+                f"<html><head><title>Article {self.path}</title></head><body><article>"
+                f"<h1>Article {self.path}</h1>" + "".join(f"<p>{PARAGRAPH}</p>" for _ in range(10)) +
+                "</article></body></html>"
+            ).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return FixtureHandler
+
+
+def start_servers(hosts: int, latency: float):
+    servers = []
+    for _ in range(hosts):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(latency))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers
+
+
+def run(fetcher: ArticleFetcher, urls):
+    start = time.perf_counter()
+    texts = fetcher.fetch_all(urls)
+    elapsed = time.perf_counter() - start
+    fetched = sum(1 for text in texts.values() if text and len(text) > 500)
+    return elapsed, fetched
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=50)
+    parser.add_argument("--hosts", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--per-host", type=int, default=4)
+    args = parser.parse_args()
+
+    servers = start_servers(args.hosts, args.latency)
+    urls = [
+        f"http://127.0.0.1:{servers[idx % len(servers)].server_address[1]}/article-{idx}"
+        for idx in range(args.articles)
+    ]
+
+    serial_time, serial_count = run(ArticleFetcher(max_workers=1, per_host_limit=1), urls)
+    concurrent_time, concurrent_count = run(ArticleFetcher(max_workers=args.workers, per_host_limit=args.per_host), urls)
+
+    print(f"articles: {args.articles} on {args.hosts} hosts, {args.latency}s latency per page")
+    print(f"serial:     {serial_time:.2f}s ({serial_count} articles)")
+    print(f"concurrent: {concurrent_time:.2f}s ({concurrent_count} articles, {args.workers} workers, {args.per_host} per host)")
+    print(f"speedup:    {serial_time / concurrent_time:.1f}x")
+
+    for server in servers:
+        server.shutdown()
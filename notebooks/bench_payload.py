@@ -0,0 +1,129 @@
+"""
+Search response size and clustering latency with the whole article in every point (full_object)
+against the compact payload plus the document store.
+
+Indexes `--articles` synthetic articles, padded with `--content-words` words of scraped content and
+an rss html summary, once per layout into Qdrant (in memory, or the server at `--url`) or into a
+LocalVectorBackend directory (`--local`), then builds the popular-article clusters `--repeat` times.
+
+    python bench_payload.py --articles 2000 --n 50 --k 10 --m 5
+    python bench_payload.py --url http://localhost:6333 --n 50 --k 10 --m 5
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import qdrant_client
+from llama_index.core import Document
+
+from bench_clustering import CountingClient, HashingEmbedding, synthetic_articles
+from database_manager import IndexBuilder
+from document_store import DocumentStore
+from vector_backends import LocalVectorBackend
+
+
+class PayloadCounter(CountingClient):
+    """counts the search requests and the bytes of the payloads they return"""
+
+    def __init__(self, client):
+        super().__init__(client)
+        self.payload_bytes = 0
+
+    def _measure(self, hits):
+        self.payload_bytes += sum(len(json.dumps(hit.payload or {})) for hit in hits)
+
+    def search(self, *args, **kwargs):
+        hits = super().search(*args, **kwargs)
+        self._measure(hits)
+        return hits
+
+    def search_batch(self, *args, **kwargs):
+        results = super().search_batch(*args, **kwargs)
+        for hits in results:
+            self._measure(hits)
+        return results
+
+
+def padded_articles(count: int, content_words: int, seed: int = 1):
+    rng = random.Random(seed)
+    articles = synthetic_articles(count, seed)
+    for article in articles:
+        article["link"] = f"https://example.com/{article['id']}"
+        article["published"] = "Fri, 22 Nov 2024 23:07:07 GMT"
+        article["content"] = " ".join(f"word{rng.randrange(50000)}" for _ in range(content_words))
+        article["rss_summary"] = f'<div><img src="{article["media_content"][0]["url"]}" /><p>{article["content"][:2000]}</p></div>'
+    return articles
+
+
+def full_object_documents(articles):
+    """the documents of the previous layout, with the whole article in the metadata"""
+    return [
+        Document(
+            text=article["extracted_data"]["summary"],
+            metadata={"id": idx, "full_object": article},
+            excluded_llm_metadata_keys=["full_object", "id"],
+            excluded_embed_metadata_keys=["full_object", "id"],
+        )
+        for idx, article in enumerate(articles)
+    ]
+
+
+def run(layout: str, articles, args, workdir: str):
+    embed_model = HashingEmbedding(model_name="hashing", latency=0.0)
+    document_store = DocumentStore(os.path.join(workdir, f"{layout}.sqlite3"))
+    collection_name = f"bench_{layout}"
+    if args.local:
+        path = os.path.join(args.local, layout)
+        shutil.rmtree(path, ignore_errors=True)
+        counter = PayloadCounter(LocalVectorBackend(path))
+        builder = IndexBuilder(collection_name=collection_name, embed_model=embed_model, vector_backend=counter,
+                               document_store=document_store)
+    else:
+        counter = PayloadCounter(qdrant_client.QdrantClient(url=args.url) if args.url else qdrant_client.QdrantClient(":memory:"))
+        if args.url and counter.collection_exists(collection_name):
+            counter.delete_collection(collection_name)
+        builder = IndexBuilder(collection_name=collection_name, client=counter, embed_model=embed_model,
+                               document_store=document_store)
+
+    if layout == "full_object":
+        builder.documents = full_object_documents(articles)
+    else:
+        builder.process_documents(articles)
+    builder.build_storage_context()
+    builder.build_index()
+
+    counter.requests = counter.payload_bytes = 0
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        clusters = builder.build_popular_clusters(args.n, args.k, args.m)
+    elapsed = (time.perf_counter() - start) / args.repeat
+    return elapsed, counter.requests // args.repeat, counter.payload_bytes // args.repeat, clusters
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=2000)
+    parser.add_argument("--content-words", type=int, default=1200)
+    parser.add_argument("--n", type=int, default=10)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--m", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--url", default=None, help="Qdrant server url, in memory if not set")
+    parser.add_argument("--local", default=None, help="directory of LocalVectorBackends to use instead of Qdrant")
+    args = parser.parse_args()
+
+    articles = padded_articles(args.articles, args.content_words)
+    print(f"articles: {args.articles}, {args.content_words} words of content, n={args.n} k={args.k} m={args.m}, "
+          f"vector store: {args.local or args.url or 'in-memory qdrant'}")
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for layout in ("full_object", "compact"):
+            elapsed, requests, payload_bytes, clusters = run(layout, articles, args, workdir)
+            results[layout] = [sorted(article["id"] for article in cluster) for cluster in clusters]
+            print(f"{layout + ':':13}{elapsed * 1000:.1f} ms per clustering, {requests} search requests, "
+                  f"{payload_bytes / 1024:.0f} KiB of search payload")
+    print(f"same clusters: {results['full_object'] == results['compact']}")
@@ -0,0 +1,54 @@
+"""
+Token savings of the extraction preprocessing over already scraped articles.
+
+Counts the tokens of the raw article content, after boilerplate stripping and after the token
+budget (truncation or chunking) for every entry of the given files. No LLM calls are made.
+
+    python bench_preprocessing.py rss_feed_entries_*.json --max-tokens 1000 --chunk-threshold 2000
+"""
+import argparse
+import glob
+
+from jsonl_store import iter_entries
+from text_preprocessor import TextPreprocessor, strip_boilerplate
+from token_counter import count_tokens
+
+
+def percent(part: int, whole: int) -> str:
+    return f"{100 * (1 - part / whole):.1f}%" if whole else "-"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--max-tokens", type=int, default=3000)
+    parser.add_argument("--chunk-threshold", type=int, default=6000)
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob("rss_feed_entries_*.json*"))
+    preprocessor = TextPreprocessor(max_tokens=args.max_tokens, chunk_threshold=args.chunk_threshold)
+
+    totals = {"articles": 0, "raw": 0, "cleaned": 0, "prepared": 0, "truncated": 0, "chunked": 0}
+    for path in files:
+        for entry in iter_entries(path):
+            content = entry.get("content", "")
+            if len(content) <= 500:
+                continue
+            cleaned = count_tokens(strip_boilerplate(content))
+            parts = preprocessor.prepare(content)
+            prepared = sum(count_tokens(part) for part in parts)
+
+            totals["articles"] += 1
+            totals["raw"] += count_tokens(content)
+            totals["cleaned"] += cleaned
+            totals["prepared"] += prepared
+            totals["truncated"] += len(parts) == 1 and prepared < cleaned
+            totals["chunked"] += len(parts) > 1
+
+    print(f"files: {', '.join(files)}")
+    print(f"articles: {totals['articles']} ({totals['truncated']} truncated, {totals['chunked']} chunked)")
+    print(f"raw tokens:          {totals['raw']}")
+    print(f"without boilerplate: {totals['cleaned']} (-{percent(totals['cleaned'], totals['raw'])})")
+    print(f"extraction input:    {totals['prepared']} (-{percent(totals['prepared'], totals['raw'])})")
+    if totals["articles"]:
+        print(f"tokens/article:      {totals['raw'] / totals['articles']:.0f} -> {totals['prepared'] / totals['articles']:.0f}")
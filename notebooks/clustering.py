@@ -0,0 +1,148 @@
+from typing import List, Optional
+
+import numpy as np
+
+from similarity import normalize_rows, top_k
+
+
+class MiniBatchKMeans:
+    """
+    Spherical mini-batch k-means: cosine similarity, unit length centroids. The rows passed in are
+    expected to be unit length already (normalize_rows), so large matrices are not copied.
+
+    Centroids start from k-means++ seeds on a sample and are moved towards the mean of the rows
+    assigned to them in each mini-batch, with a per-centroid learning rate of 1 / (rows seen so far),
+    so one pass costs O(batch_size * n_clusters * dim) however large the corpus is.
+    """
+
+    def __init__(
+        self,
+        n_clusters: int,
+        batch_size: int = 1024,
+        iterations: int = 100,
+        tol: float = 1e-4,
+        seed: int = 1,
+    ):
+        self.n_clusters = n_clusters
+        self.batch_size = batch_size
+        self.iterations = iterations
+        self.tol = tol
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+
+    def _seed_centroids(self, sample: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+        """
+        k-means++ seeding, distance 1 - cosine similarity
+        """
+        chosen = [int(rng.integers(len(sample)))]
+        distances = 1.0 - sample @ sample[chosen[0]]
+        for _ in range(1, k):
+            weights = np.clip(distances, 0.0, None)
+            total = weights.sum()
+            idx = int(rng.choice(len(sample), p=weights / total)) if total > 0 else int(rng.integers(len(sample)))
+            chosen.append(idx)
+            distances = np.minimum(distances, 1.0 - sample @ sample[idx])
+        return sample[chosen].copy()
+
+    def fit(self, vectors) -> "MiniBatchKMeans":
+        vectors = np.asarray(vectors, dtype=np.float32)
+        k = min(self.n_clusters, len(vectors))
+        rng = np.random.default_rng(self.seed)
+        sample = vectors[rng.choice(len(vectors), size=min(len(vectors), max(3 * k, self.batch_size)), replace=False)]
+        centroids = self._seed_centroids(sample, k, rng)
+        counts = np.zeros(k)
+
+        for _ in range(self.iterations):
+            batch = vectors[rng.integers(len(vectors), size=min(self.batch_size, len(vectors)))]
+            labels = np.argmax(batch @ centroids.T, axis=1)
+            batch_counts = np.bincount(labels, minlength=k)
+            assigned = batch_counts > 0
+            # per-centroid sums of the batch rows, summed over the rows sorted by centroid
+            order = np.argsort(labels, kind="stable")
+            sums = np.zeros_like(centroids)
+            sums[assigned] = np.add.reduceat(batch[order], np.searchsorted(labels[order], np.flatnonzero(assigned)))
+
+            counts[assigned] += batch_counts[assigned]
+            rate = (batch_counts[assigned] / counts[assigned])[:, None]
+            previous = centroids
+            centroids = centroids.copy()
+            centroids[assigned] = (1.0 - rate) * centroids[assigned] + rate * (sums[assigned] / batch_counts[assigned][:, None])
+            centroids = normalize_rows(centroids)
+            if np.max(1.0 - np.sum(previous * centroids, axis=1)) < self.tol:
+                break
+
+        self.centroids = centroids
+        return self
+
+    def predict(self, vectors, chunk_size: int = 65536):
+        """
+        index of the closest centroid of every row and the cosine similarity to it
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        labels = np.empty(len(vectors), dtype=np.int64)
+        similarities = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), chunk_size):
+            scores = vectors[start:start + chunk_size] @ self.centroids.T
+            labels[start:start + chunk_size] = np.argmax(scores, axis=1)
+            similarities[start:start + chunk_size] = scores[np.arange(len(scores)), labels[start:start + chunk_size]]
+        return labels, similarities
+
+
+class RankedCluster:
+    """
+    Rows of one cluster, most central first, with the score the clusters are ranked by.
+    """
+
+    __slots__ = ("rows", "size", "density", "topic_similarity", "score")
+
+    def __init__(self, rows: np.ndarray, size: int, density: float, topic_similarity: float, score: float):
+        self.rows = rows
+        self.size = size
+        self.density = density
+        self.topic_similarity = topic_similarity
+        self.score = score
+
+    def __repr__(self) -> str:
+        return f"RankedCluster(size={self.size}, density={self.density:.3f}, score={self.score:.3f})"
+
+
+def rank_clusters(
+    vectors,
+    labels: np.ndarray,
+    similarities: np.ndarray,
+    topic_embedding=None,
+    topic_weight: float = 1.0,
+    min_cluster_size: int = 2,
+) -> List[RankedCluster]:
+    """
+    Clusters by score, highest first. Like the popular-article score (similarity to the nearest
+    neighbors plus the weighted similarity to the topic), every member adds its similarity to the
+    centroid plus `topic_weight` times its similarity to the topic, so large, dense and on-topic
+    clusters come first. Clusters smaller than `min_cluster_size` are left out.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    topic_similarities = (
+        vectors @ normalize_rows(topic_embedding)[0] if topic_embedding is not None else np.zeros(len(vectors), dtype=np.float32)
+    )
+
+    order = np.argsort(labels, kind="stable")
+    offsets = np.searchsorted(labels[order], np.arange(labels.max() + 2)) if len(labels) else np.zeros(1, dtype=np.int64)
+    clusters = []
+    for label in range(len(offsets) - 1):
+        rows = order[offsets[label]:offsets[label + 1]]
+        if len(rows) < max(min_cluster_size, 1):
+            continue
+        density = float(similarities[rows].mean())
+        topic_similarity = float(topic_similarities[rows].mean())
+        score = float(similarities[rows].sum() + topic_weight * topic_similarities[rows].sum())
+        clusters.append(RankedCluster(rows[top_k(similarities[rows], len(rows))], len(rows), density, topic_similarity, score))
+
+    return [clusters[idx] for idx in top_k(np.array([cluster.score for cluster in clusters]), len(clusters))]
+
+
+def default_cluster_count(rows: int, cluster_size: int = 100) -> int:
+    """
+    one cluster per `cluster_size` rows, a story split over two clusters still gives two pure
+    clusters while two stories merged into one do not
+    """
+    return max(1, rows // cluster_size)
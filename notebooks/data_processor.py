@@ -13,9 +13,11 @@ QDRANT_API_KEY=settings.QDRANT_API_KEY
 
 
 import feedparser
-from typing import List, Dict
-from newspaper import Article
+from typing import Iterator, List, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
+import threading
+import time
 import nltk
 nltk.download('punkt')
 
@@ -23,6 +25,13 @@ from pydantic import BaseModel, Field
 from llama_index.program.openai import OpenAIPydanticProgram
 from llama_index.core.prompts import ChatPromptTemplate, ChatMessage
 
+from article_fetcher import ArticleFetcher
+from feed_ledger import FeedLedger, entry_key, hash_text
+from jsonl_store import JsonlWriter
+from token_counter import count_tokens
+from text_preprocessor import TextPreprocessor
+from near_duplicates import NearDuplicateIndex
+
 
 from llama_index.llms.azure_openai import AzureOpenAI
 
@@ -62,9 +71,128 @@ class ArticleExtraction(BaseModel):
         )
     )
 
+class BatchArticleExtraction(ArticleExtraction):
+    """The extracted information of one article of a batch."""
+
+    article_number: int = Field(
+        description="The number of the article (as given in its header) this extraction belongs to."
+    )
+
+class ArticleExtractionBatch(BaseModel):
+    """The extracted information of every article of a batch."""
+
+    extractions: List[BatchArticleExtraction] = Field(
+        description="Exactly one extraction per article, in the order of the articles."
+    )
+
+class ExtractionStats:
+    """
+    Counts extraction calls, articles and (estimated) tokens, thread safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.articles = 0
+        self.calls = 0
+        self.batch_fallbacks = 0
+        self.chunked_articles = 0
+        self.chunks = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def record(self, articles: int, prompt_tokens: int, completion_tokens: int):
+        with self._lock:
+            self.articles += articles
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+
+    def record_fallback(self):
+        with self._lock:
+            self.batch_fallbacks += 1
+
+    def record_chunked(self, chunks: int):
+        with self._lock:
+            self.chunked_articles += 1
+            self.chunks += chunks
+
+    def report(self) -> Dict:
+        elapsed = time.perf_counter() - self.started
+        articles = max(self.articles, 1)
+        return {
+            "articles": self.articles,
+            "calls": self.calls,
+            "batch_fallbacks": self.batch_fallbacks,
+            "chunked_articles": self.chunked_articles,
+            "chunks": self.chunks,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "tokens_per_article": round((self.prompt_tokens + self.completion_tokens) / articles, 1),
+            "articles_per_minute": round(self.articles / elapsed * 60, 1) if elapsed > 0 else 0.0,
+        }
+
+SUMMARY_REDUCE_PROMPT = (
+    "The following are summaries of consecutive parts of one article.\n"
+    "Combine them into one concise summary of the whole article, focusing only on the most relevant "
+    "information. Return only the summary.\n\n"
+    "{summaries}"
+)
+
+class TokenBatcher:
+    """
+    Packs items into batches of at most `token_budget` tokens and `max_batch_size` items.
+    An item larger than the budget forms a batch on its own.
+    """
+
+    def __init__(self, token_budget: int, max_batch_size: int = 8):
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+        self.items = []
+        self.tokens = 0
+
+    def add(self, item, tokens: int) -> Optional[List]:
+        """
+        add the item of `tokens` tokens, returns the previous batch if the item did not fit into it anymore
+        """
+        full = None
+        if self.items and (self.tokens + tokens > self.token_budget or len(self.items) >= self.max_batch_size):
+            full = self.flush()
+        self.items.append(item)
+        self.tokens += tokens
+        return full
+
+    def flush(self) -> List:
+        items, self.items, self.tokens = self.items, [], 0
+        return items
+
 class RSSParser:
-    def __init__(self, feed_url: str):
+    def __init__(
+        self,
+        feed_url: str,
+        fetcher: Optional[ArticleFetcher] = None,
+        extraction_workers: int = 4,
+        ledger: Optional[FeedLedger] = None,
+        batch_token_budget: Optional[int] = None,
+        max_batch_size: int = 8,
+        preprocessor: Optional[TextPreprocessor] = None,
+        dedup_index: Optional[NearDuplicateIndex] = None,
+    ):
         self.feed_url = feed_url
+        self.fetcher = fetcher or ArticleFetcher()
+        self.extraction_workers = extraction_workers
+        # with a ledger only new or changed entries are downloaded and extracted
+        self.ledger = ledger
+        # position of each entry in the last fetched feed
+        self.feed_order: Dict[str, int] = {}
+        # with a token budget, several articles are extracted with one LLM call
+        self.batch_token_budget = batch_token_budget
+        self.max_batch_size = max_batch_size
+        self.stats = ExtractionStats()
+        # boilerplate stripping, token budget and chunking of the extraction input
+        self.preprocessor = preprocessor or TextPreprocessor()
+        # with a near-duplicate index, syndicated copies of already seen articles are dropped before extraction
+        self.dedup_index = dedup_index
 
         self.llm = llm
 
@@ -101,9 +229,45 @@ class RSSParser:
             verbose=True,
         )
 
-    def fetch_feed(self) -> Dict:
+        batch_schema = ArticleExtractionBatch.schema_json(indent=2)
+
+        self.batch_prompt = ChatPromptTemplate(
+            message_templates=[
+                ChatMessage(
+                    role="system",
+                    content=(
+                        "You are an expert assistant for extracting insights from articles in JSON format.\n"
+                        "You are given several numbered articles. For EACH article you extract data and return it in JSON format, "
+                        "according to the provided JSON schema, with exactly one extraction per article and its article_number.\n"
+                        "REMEMBER to return extracted data of an article only from that article's content.\n\n"
+                        "The JSON schema is:\n"
+                        f"{batch_schema}"
+                    ),
+                ),
+                ChatMessage(
+                    role="user",
+                    content="{articles}",
+                ),
+            ]
+        )
+
+        self.batch_program = OpenAIPydanticProgram.from_defaults(
+            output_cls=ArticleExtractionBatch,
+            llm=self.llm,
+            prompt=self.batch_prompt,
+            verbose=True,
+        )
+
+    def fetch_feed(self, conditional: bool = False) -> Dict:
+        """
+        With `conditional`, the ETag/Last-Modified of the last run are sent and an unchanged
+        feed comes back with status 304 and no entries.
+        """
         try:
-            feed = feedparser.parse(self.feed_url)
+            etag, modified = None, None
+            if conditional and self.ledger is not None:
+                etag, modified = self.ledger.get_feed_validators(self.feed_url)
+            feed = feedparser.parse(self.feed_url, etag=etag, modified=modified)
             if feed.bozo:
                 raise ValueError(f"Error parsing feed: {feed.bozo_exception}")
             return feed
@@ -114,51 +278,241 @@ class RSSParser:
         """
         Fetch the article from the URL and extract its main content.
         """
+        return self.fetcher.fetch_article_text(url) or ""
+
+    def prompt_tokens(self, prompt: ChatPromptTemplate, **kwargs) -> int:
+        return sum(count_tokens(message.content or "") for message in prompt.format_messages(**kwargs))
+
+    def extract_text(self, text: str, articles: int = 1) -> Optional[ArticleExtraction]:
+        try:
+            # Use the program to extract data
+            extraction_result = self.program(article_content=text)  # Pydantic object
+            print('Extraction result:', extraction_result)
+            self.stats.record(
+                articles,
+                self.prompt_tokens(self.prompt, article_content=text),
+                count_tokens(extraction_result.json()),
+            )
+            return extraction_result
+        except Exception as e:
+            print(f"Failed to extract structured data from content: {e}")
+            return None
+
+    def extract_chunks(self, chunks: List[str]) -> Optional[ArticleExtraction]:
+        """
+        Map-reduce extraction of a long article: every chunk is extracted on its own, the chunk
+        summaries are combined by one more LLM call and the other fields are merged.
+        """
+        extractions = [
+            extraction for extraction in (self.extract_text(chunk, articles=0) for chunk in chunks)
+            if extraction is not None
+        ]
+        if not extractions:
+            return None
+
+        summaries = "\n".join(f"- {extraction.summary}" for extraction in extractions)
+        prompt = SUMMARY_REDUCE_PROMPT.format(summaries=summaries)
         try:
-            article = Article(url)
-            article.download()
-            article.parse()
-            return article.text
+            summary = self.llm.complete(prompt).text.strip()
         except Exception as e:
-            print(f"Failed to extract article content from {url}: {e}")
-            return ""
+            print(f"Failed to combine the chunk summaries: {e}")
+            summary = " ".join(extraction.summary for extraction in extractions)
+        self.stats.record(1, count_tokens(prompt), count_tokens(summary))
+        self.stats.record_chunked(len(chunks))
+        return merge_extractions(extractions, summary)
 
-    def extract_entries_with_content(self) -> List[Dict]:
+    def extract_structured_data(self, content: str) -> Optional[ArticleExtraction]:
+        """
+        Extract the structured data of the article content after preprocessing (boilerplate removed,
+        truncated to the token budget, or extracted in chunks when it is very long).
+        """
+        parts = self.preprocessor.prepare(content)
+        if len(parts) == 1:
+            return self.extract_text(parts[0])
+        return self.extract_chunks(parts)
+
+    def extract_structured_data_batch(self, contents: List[str]) -> List[Optional[ArticleExtraction]]:
+        """
+        Extract several articles with one call. If the call fails or does not return exactly one
+        extraction per article, every article is extracted on its own.
+        Articles that need a chunked extraction are never batched.
+        """
+        prepared = [self.preprocessor.prepare(content) for content in contents]
+        results: List[Optional[ArticleExtraction]] = [None] * len(contents)
+        texts = {}
+        for idx, parts in enumerate(prepared):
+            if len(parts) == 1:
+                texts[idx] = parts[0]
+            else:
+                results[idx] = self.extract_chunks(parts)
+
+        if len(texts) == 1:
+            for idx, text in texts.items():
+                results[idx] = self.extract_text(text)
+        elif texts:
+            for idx, extraction_result in zip(texts, self.extract_text_batch(list(texts.values()))):
+                results[idx] = extraction_result
+        return results
+
+    def extract_text_batch(self, texts: List[str]) -> List[Optional[ArticleExtraction]]:
+        articles = format_batch_articles(texts)
+        try:
+            batch = self.batch_program(articles=articles)
+            by_number = {extraction.article_number: extraction for extraction in batch.extractions}
+            if len(batch.extractions) != len(texts) or set(by_number) != set(range(1, len(texts) + 1)):
+                raise ValueError(
+                    f"expected article numbers 1..{len(texts)}, got {[e.article_number for e in batch.extractions]}"
+                )
+            self.stats.record(
+                len(texts),
+                self.prompt_tokens(self.batch_prompt, articles=articles),
+                count_tokens(batch.json()),
+            )
+            return [
+                ArticleExtraction(**by_number[number].dict(exclude={"article_number"}))
+                for number in range(1, len(texts) + 1)
+            ]
+        except Exception as e:
+            print(f"Batch extraction of {len(texts)} articles failed, extracting them one by one: {e}")
+            self.stats.record_fallback()
+            return [self.extract_text(text) for text in texts]
+
+    def extract_entry_batch(self, items: List[Tuple[Dict, str]]) -> List[Optional[ArticleExtraction]]:
+        """
+        extract the structured data of (entry, content) pairs, reusing the ledger's extraction
+        of every entry whose article content did not change
+        """
+        results: List[Optional[ArticleExtraction]] = [None] * len(items)
+        if self.ledger is not None:
+            for idx, (entry, content) in enumerate(items):
+                previous = self.ledger.get_extraction(entry, hash_text(content))
+                if previous is not None:
+                    results[idx] = ArticleExtraction(**previous)
+
+        pending = [idx for idx, result in enumerate(results) if result is None]
+        if pending:
+            extracted = self.extract_structured_data_batch([items[idx][1] for idx in pending])
+            for idx, extraction_result in zip(pending, extracted):
+                results[idx] = extraction_result
+        return results
+
+    def extract_entry_data(self, entry, content: str) -> Optional[ArticleExtraction]:
+        return self.extract_entry_batch([(entry, content)])[0]
+
+    def is_near_duplicate(self, index: Optional[NearDuplicateIndex], entry, content: str) -> bool:
+        if index is None:
+            return False
+        duplicate_of = index.check(entry_key(entry), content)
+        if duplicate_of is not None:
+            print(f"Skipping {entry.get('link', '')}, near duplicate of {duplicate_of}")
+        return duplicate_of is not None
+
+    def build_entry_item(self, entry, content: str, extraction_result: Optional[ArticleExtraction]) -> Dict:
+        return {
+            "title": entry.get("title", "No title"),
+            "rss_summary": entry.get("summary", ""),
+            "link": entry.get("link", ""),
+            "id": entry.get("id", "No ID"),
+            "authors": entry.get("authors", []),
+            "published": entry.get("published", "Not specified"),
+            "published_parsed": entry.get("published_parsed", None),
+            "media_content": entry.get("media_content", []),
+            "content": content,
+            "extracted_data": extraction_result.dict() if extraction_result else {},
+        }
+
+    def iter_entries_with_content(self) -> Iterator[Dict]:
         """
         Extract entries from the RSS feed, including the main content of each linked article.
         Enrich the content using LlamaIndex structured data extraction.
+
+        Articles are downloaded concurrently and each one is handed to the extraction pool as soon
+        as it arrives. Entries are yielded in completion order as soon as their extraction finishes,
+        and only recorded in the ledger after the consumer took them, so an interrupted run resumes
+        with the entries it did not write yet.
         """
-        feed = self.fetch_feed()
-        entries = []
-
-        for entry in feed.entries:
-            content = self.extract_article_content(entry.get("link", ""))
-            if len(content) > 500:
-                try:
-                    # Use the program to extract data
-                    response = self.program(article_content=content)
-                    extraction_result = response  # Pydantic object
-                    print('Extraction result:', extraction_result)
-                except Exception as e:
-                    print(f"Failed to extract structured data from content: {e}")
-                    extraction_result = None
-
-                item = {
-                    "title": entry.get("title", "No title"),
-                    "rss_summary": entry.get("summary", ""),
-                    "link": entry.get("link", ""),
-                    "id": entry.get("id", "No ID"),
-                    "authors": entry.get("authors", []),
-                    "published": entry.get("published", "Not specified"),
-                    "published_parsed": entry.get("published_parsed", None),
-                    "media_content": entry.get("media_content", []),
-                    "content": content,
-                    "extracted_data": extraction_result.dict() if extraction_result else {},
-                }
-                entries.append(item)
-            else:
-                print(f"Content too short or empty for URL {entry.get('link', '')}")
-        return entries
+        feed = self.fetch_feed(conditional=self.ledger is not None)
+        if feed.get("status") == 304:
+            print(f"Feed {self.feed_url} not modified since the last run")
+            return
+
+        feed_entries = feed.entries
+        if self.ledger is not None:
+            feed_entries = [entry for entry in feed.entries if not self.ledger.is_unchanged(entry)]
+            print(f"{len(feed.entries) - len(feed_entries)} of {len(feed.entries)} entries unchanged since the last run")
+        entries_by_link = {entry.get("link", ""): entry for entry in feed_entries}
+        self.feed_order = {link: idx for idx, link in enumerate(entries_by_link)}
+
+        extractions = {}
+        batcher = TokenBatcher(self.batch_token_budget or 0, self.max_batch_size)
+        # entries to retry on the next run, the feed validators are only kept when there are none
+        failed = 0
+        # articles of this run that are not written yet, they only go into the dedup index once written
+        pending = self.dedup_index.pending() if self.dedup_index is not None else None
+
+        def finished():
+            nonlocal failed
+            for future in [future for future in extractions if future.done()]:
+                items = extractions.pop(future)
+                for (entry, content), extraction_result in zip(items, future.result()):
+                    yield self.build_entry_item(entry, content, extraction_result)
+                    # failed extractions are not recorded, so they are retried on the next run
+                    if self.ledger is not None and extraction_result is not None:
+                        self.ledger.record(entry, hash_text(content), extraction_result.dict())
+                    if pending is not None:
+                        pending.remove(entry_key(entry))
+                        if extraction_result is not None:
+                            self.dedup_index.add(entry_key(entry), content)
+                    failed += extraction_result is None
+
+        with ThreadPoolExecutor(max_workers=self.extraction_workers) as extraction_pool:
+            for link, content in self.fetcher.iter_fetch(entries_by_link):
+                entry = entries_by_link[link]
+                if content is None:
+                    # failed downloads are not recorded either, so they are retried on the next run
+                    failed += 1
+                elif len(content) <= 500:
+                    print(f"Content too short or empty for URL {link}")
+                    if self.ledger is not None:
+                        self.ledger.record(entry, hash_text(content), None)
+                elif self.is_near_duplicate(self.dedup_index, entry, content):
+                    if self.ledger is not None:
+                        self.ledger.record(entry, hash_text(content), None)
+                elif self.is_near_duplicate(pending, entry, content):
+                    # the article it duplicates is not written yet, this one is seen again on the next run
+                    failed += 1
+                else:
+                    if pending is not None:
+                        pending.add(entry_key(entry), content)
+                    if self.batch_token_budget is None:
+                        extractions[extraction_pool.submit(self.extract_entry_batch, [(entry, content)])] = [(entry, content)]
+                    else:
+                        # articles are collected until the next one would exceed the token budget,
+                        # counted after preprocessing as that is the text that goes into the prompt
+                        batch = batcher.add((entry, content), self.preprocessor.input_tokens(content))
+                        if batch:
+                            extractions[extraction_pool.submit(self.extract_entry_batch, batch)] = batch
+                yield from finished()
+
+            batch = batcher.flush()
+            if batch:
+                extractions[extraction_pool.submit(self.extract_entry_batch, batch)] = batch
+
+            for _ in as_completed(list(extractions)):
+                yield from finished()
+
+        if pending is not None:
+            pending.close()
+        print("Extraction stats:", self.stats.report())
+        if self.ledger is not None and not failed:
+            self.ledger.set_feed_validators(self.feed_url, feed.get("etag"), feed.get("modified"))
+
+    def extract_entries_with_content(self) -> List[Dict]:
+        """
+        All entries of iter_entries_with_content, in feed order.
+        """
+        entries = list(self.iter_entries_with_content())
+        return sorted(entries, key=lambda item: self.feed_order[item["link"]])
 
     def get_feed_metadata(self) -> Dict:
         feed = self.fetch_feed()
@@ -169,6 +523,34 @@ class RSSParser:
             "published": feed.feed.get("published", "Not specified")
         }
 
+def merge_extractions(extractions: List[ArticleExtraction], summary: str) -> ArticleExtraction:
+    """
+    merge the extractions of the chunks of one article, keeping the first occurrence of every
+    keyword, fact and date
+    """
+    keywords = {}
+    facts = {}
+    important_dates = {}
+    for extraction in extractions:
+        for keyword in extraction.keywords:
+            keywords.setdefault(keyword.strip().lower(), keyword.strip())
+        for fact in extraction.facts:
+            facts.setdefault(fact.strip().lower(), fact.strip())
+        for date, fact in extraction.important_dates.items():
+            important_dates.setdefault(date, fact)
+    return ArticleExtraction(
+        summary=summary,
+        keywords=list(keywords.values()),
+        facts=list(facts.values()),
+        important_dates=important_dates,
+    )
+
+def format_batch_articles(contents: List[str]) -> str:
+    return "\n\n".join(
+        f"Article {number} Content:\n------\n{content}\n------"
+        for number, content in enumerate(contents, start=1)
+    )
+
 def save_entries_to_json(entries: List[Dict], filename: str):
     """
     Save the list of entries to a JSON file.
@@ -190,8 +572,14 @@ if __name__ == "__main__":
     # feed_url_3 = "https://rss.app/feeds/MLuDKqkwFtd2tuMr.xml"
     eng_feed_url_1 = "https://rss.app/feeds/u6rcvfy6PTSf9vQ4.xml"
     eng_feed_url_2 = "https://rss.feedspot.com/uk_car_rss_feeds/"
-    parser = RSSParser(eng_feed_url_1)
-    entries = parser.extract_entries_with_content()
 
-    save_entries_to_json(entries, "./rss_feed_entries_3.json")
-    save_entries_to_json(entries, "./rss_feed_entries_4.json")
+    # entries are appended to the JSONL file as soon as they are extracted, the ledger skips
+    # entries that are already processed, so an interrupted run can simply be started again
+    ledger = FeedLedger("./feed_ledger.sqlite3")
+    dedup_index = NearDuplicateIndex("./near_duplicates.sqlite3")
+    parser = RSSParser(eng_feed_url_1, ledger=ledger, batch_token_budget=6000, dedup_index=dedup_index)
+    with JsonlWriter("./rss_feed_entries.jsonl") as writer:
+        written = writer.write_all(parser.iter_entries_with_content())
+    ledger.close()
+    dedup_index.close()
+    print(f"{written} new entries appended to ./rss_feed_entries.jsonl")
@@ -1,6 +1,8 @@
 import logging
+import hashlib
 import json
 import os
+import time
 from dotenv import load_dotenv
 from llama_index.core import VectorStoreIndex, StorageContext, Document
 from llama_index.embeddings.azure_openai import AzureOpenAIEmbedding
@@ -11,11 +13,62 @@ from llama_index.vector_stores.qdrant import QdrantVectorStore
 from data_processor import llm
 from datetime import datetime
 from text_generator import TextGenerator
+from jsonl_store import iter_entries
+from embedding_cache import CachedEmbedding, EmbeddingCache
+from similarity import EmbeddingMatrix, cosine_similarity, normalize_rows, top_k
+from clustering import MiniBatchKMeans, default_cluster_count, rank_clusters
+from online_clustering import OnlineClusterer
+from vector_backends import QdrantBackend
+from document_store import PAYLOAD_FIELDS, DocumentStore, compact_payload
 
 import numpy as np
 
 from settings import settings
 
+def stored_vector(point):
+    """
+    the dense vector returned with a search hit (with_vectors=True), None if it was not requested
+    """
+    vector = point.vector
+    if isinstance(vector, dict):
+        vector = vector.get("text-dense", vector.get(""))
+    return vector
+
+# points indexed before the compact payload carry the whole article as full_object
+SEARCH_PAYLOAD = PAYLOAD_FIELDS + ["full_object"]
+
+def point_article(payload):
+    """
+    the compact payload of a point, also for points that carry the whole article as full_object
+    """
+    if payload and "full_object" in payload:
+        return compact_payload(payload["full_object"])
+    return payload or {}
+
+def compact_point_payload(payload):
+    """
+    the payload of a full_object point in the compact layout, keeping the llama-index node fields
+    """
+    metadata = compact_payload(payload["full_object"])
+    compacted = {key: value for key, value in payload.items() if key not in ("full_object", "id")}
+    compacted.update(metadata)
+    # llama-index keeps a copy of the node, with its metadata, in _node_content
+    if "_node_content" in compacted:
+        node = json.loads(compacted["_node_content"])
+        node["metadata"] = metadata
+        node["excluded_embed_metadata_keys"] = PAYLOAD_FIELDS
+        node["excluded_llm_metadata_keys"] = PAYLOAD_FIELDS
+        compacted["_node_content"] = json.dumps(node)
+    return compacted
+
+def cluster_image(articles):
+    """
+    image of the first article of a cluster
+    """
+    first_document = articles[0]
+    media_content = first_document.get("media_content", [])
+    return media_content[0].get("url", "") if media_content else first_document.get("image", "")
+
 class IndexBuilder:
     def __init__(
         self,
@@ -23,6 +76,14 @@ class IndexBuilder:
         collection_name="news_feed",
         embedding_engine="text-embedding-3-large",
         api_version="2024-08-01-preview",
+        embedding_cache_path="embedding_cache.sqlite3",
+        document_store_path="documents.sqlite3",
+        use_stored_vectors=True,
+        batch_search=True,
+        client=None,
+        embed_model=None,
+        vector_backend=None,
+        document_store=None,
     ):
         load_dotenv()
         self.API_KEY = settings.AZURE_OPENAI_API_KEY
@@ -35,28 +96,40 @@ class IndexBuilder:
         self.collection_name = collection_name
         self.embedding_engine = embedding_engine
         self.api_version = api_version
-
-        self.embed_model = None
-        self.client = None
+        # embeddings are cached by model and text hash, None disables the cache
+        self.embedding_cache_path = embedding_cache_path
+        # search hits come with their stored vectors, so articles are not embedded again
+        self.use_stored_vectors = use_stored_vectors
+        # all neighbor searches of a scoring pass are sent as one search_batch request
+        self.batch_search = batch_search
+
+        self.embed_model = embed_model
+        self.client = client
         self.vector_store = None
+        self.vector_backend = vector_backend
+        # full articles are kept out of the vector points, points only carry PAYLOAD_FIELDS
+        self.document_store = document_store
+        if self.document_store is None and document_store_path:
+            self.document_store = DocumentStore(document_store_path)
         self.documents = []
+        # near-duplicate index of process_documents, its new texts are only added by build_index
+        self.dedup_index = None
+        self.dedup_pending = []
         self.storage_context = None
         self.index = None
 
-        self.initialize_embedding_model()
-        self.initialize_qdrant_client()
-        self.initialize_vector_store()
+        # an embed model or client passed in (e.g. an in-memory Qdrant) is used as is
+        if self.embed_model is None:
+            self.initialize_embedding_model()
+        # without a vector backend (e.g. a LocalVectorBackend) the Qdrant collection is used
+        if self.vector_backend is None:
+            if self.client is None:
+                self.initialize_qdrant_client()
+            self.initialize_vector_store()
+            self.vector_backend = QdrantBackend(self.client, self.collection_name, self.vector_store)
 
     def compute_similarity(self, embedding1, embedding2):
-        embedding1 = np.array(embedding1)
-        embedding2 = np.array(embedding2)
-        dot_product = np.dot(embedding1, embedding2)
-        norm1 = np.linalg.norm(embedding1)
-        norm2 = np.linalg.norm(embedding2)
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
-        similarity = dot_product / (norm1 * norm2)
-        return similarity
+        return cosine_similarity(embedding1, embedding2)
 
     def initialize_embedding_model(self):
         self.embed_model = AzureOpenAIEmbedding(
@@ -65,6 +138,10 @@ class IndexBuilder:
             azure_endpoint=self.AZURE_ENDPOINT,
             api_version=self.api_version,
         )
+        if self.embedding_cache_path:
+            self.embed_model = CachedEmbedding(
+                self.embed_model, EmbeddingCache(self.embedding_cache_path), deployment=self.embedding_engine
+            )
         Settings.embed_model = self.embed_model
 
     def initialize_qdrant_client(self):
@@ -80,14 +157,16 @@ class IndexBuilder:
         )
 
     def load_data(self):
-        with open(self.json_file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        if not isinstance(data, list):
-            raise ValueError("JSON data must be a list of objects.")
-        return data
-
-    def process_documents(self, data):
+        """
+        Stream the entries of the .json or .jsonl file, .jsonl files are read line by line.
+        """
+        return iter_entries(self.json_file_path)
+
+    def process_documents(self, data, dedup_index=None):
+        articles = []
+        self.dedup_index = dedup_index
+        # new texts of this call, compared within the batch and added to dedup_index once indexed
+        pending = dedup_index.pending() if dedup_index is not None else None
         for idx, obj in enumerate(data):
             summary = obj.get("extracted_data", {}).get("summary", "")
             if not summary:
@@ -96,17 +175,31 @@ class IndexBuilder:
                 )
                 continue
 
+            # near duplicates of already indexed articles are not embedded again
+            if dedup_index is not None:
+                key, text = obj.get("id") or obj.get("link", ""), obj.get("content") or summary
+                duplicate_of = dedup_index.check(key, text)
+                if duplicate_of is None:
+                    duplicate_of = pending.check(key, text)
+                if duplicate_of is not None:
+                    print(f"Object at index {idx} is a near duplicate of {duplicate_of}. Skipping.")
+                    continue
+                pending.add(key, text)
+                self.dedup_pending.append((key, text))
+
             doc = Document(
                 text=summary,
-                metadata={
-                    "id": idx,
-                    "full_object": obj,
-                },
-                excluded_llm_metadata_keys=["full_object", "id"],
-                excluded_embed_metadata_keys=["full_object", "id"],
+                metadata=compact_payload(obj),
+                excluded_llm_metadata_keys=PAYLOAD_FIELDS,
+                excluded_embed_metadata_keys=PAYLOAD_FIELDS,
             )
             self.documents.append(doc)
+            articles.append(obj)
 
+        if pending is not None:
+            pending.close()
+        if self.document_store is not None:
+            self.document_store.put_many(articles)
         print(f"Processed {len(self.documents)} documents from JSON.")
 
     def build_storage_context(self):
@@ -115,9 +208,12 @@ class IndexBuilder:
         )
 
     def build_index(self):
-        self.index = VectorStoreIndex.from_documents(
-            self.documents, storage_context=self.storage_context
-        )
+        # a VectorStoreIndex for Qdrant, local backends only store the vectors and payloads
+        self.index = self.vector_backend.add_documents(self.documents, self.embed_model)
+        # the documents are written, later copies are near duplicates from now on
+        for key, text in self.dedup_pending:
+            self.dedup_index.add(key, text)
+        self.dedup_pending = []
 
     def get_retriever_engine(self, llm, similarity_top_k=20):
         retrieve_engine = self.index.as_retriever(
@@ -126,15 +222,13 @@ class IndexBuilder:
         return retrieve_engine
 
 
-    def find_electric_cars_articles(self, n):
+    def find_electric_cars_articles(self, n, with_vectors=False):
         # Get the embedding for the query "Electric car"
         query_embedding = self.embed_model.get_text_embedding("Electric car")
 
         # Search the vector store for the top n articles closest to the query_embedding
-        search_results = self.client.search(
-            collection_name=self.collection_name,
-            query_vector=query_embedding,
-            limit=n
+        search_results = self.vector_backend.search(
+            query_embedding, limit=n, with_vectors=with_vectors, with_payload=SEARCH_PAYLOAD
         )
 
         # Check if any results are returned
@@ -145,78 +239,152 @@ class IndexBuilder:
 
 
     def get_article_embedding(self, article_point):
-        payload = article_point.payload
-        if 'full_object' in payload:
-            extracted_data = payload['full_object']['extracted_data']
-            summary = extracted_data.get('summary')
+        payload = point_article(article_point.payload)
+        if payload:
+            summary = payload.get('summary')
 
             if not summary:
                 raise ValueError("The article does not contain 'extracted_data.summary'.")
 
-            article_embedding = self.embed_model.get_text_embedding(summary)
+            # the stored vector is the embedding of the summary
+            article_embedding = stored_vector(article_point) if self.use_stored_vectors else None
+            if article_embedding is None:
+                article_embedding = self.embed_model.get_text_embedding(summary)
 
             return article_embedding, summary
         return None, None
 
-    def find_nearest_documents(self, article_embedding, top_k=5):
-        search_results = self.client.search(
-            collection_name=self.collection_name,
-            query_vector=article_embedding,
-            limit=top_k
+    def find_nearest_documents(self, article_embedding, top_k=5, with_vectors=False):
+        search_results = self.vector_backend.search(
+            article_embedding, limit=top_k, with_vectors=with_vectors, with_payload=SEARCH_PAYLOAD
         )
 
         return search_results
 
-
-    def remove_duplicate_points_by_title(self):
-        title_to_point_id = {}
-        points_to_delete = []
-
-        all_points = self.client.scroll(
-            collection_name=self.collection_name,
-            scroll_filter=None,
-            limit=1000
+    def find_nearest_documents_batch(self, article_embeddings, top_k=5, with_vectors=False, with_payload=SEARCH_PAYLOAD):
+        """
+        nearest documents of every embedding, with one request (or one search per embedding without batch_search)
+        """
+        if not self.batch_search:
+            return [
+                self.find_nearest_documents(article_embedding, top_k=top_k, with_vectors=with_vectors)
+                for article_embedding in article_embeddings
+            ]
+        return self.vector_backend.search_batch(
+            article_embeddings, limit=top_k, with_vectors=with_vectors, with_payload=with_payload
         )
 
-        for point in all_points[0]:
-            payload = point.payload
-            full_object = payload.get('full_object')
-            title = full_object.get('title') if full_object else None
 
-            # If 'full_object' or 'title' is missing, mark the point for deletion
-            if not full_object or title is None:
-                points_to_delete.append(point.id)
-                continue
+    def remove_duplicate_points_by_title(self, batch_size=1000):
+        """
+        Delete the points whose title was already seen and the points without a title, streaming
+        over the whole collection one page at a time with one delete request per page. Returns the
+        article ids that are no longer in the vector store.
+        """
+        # 16 byte digests of the titles seen so far, with the article id of the point that was kept
+        kept_by_title = {}
+        removed = 0
+        removed_article_ids = set()
+
+        for points in self.vector_backend.iter_points(batch_size, with_payload=["article_id", "title", "full_object"]):
+            points_to_delete = []
+            deleted_article_ids = set()
+            for point in points:
+                payload = point_article(point.payload)
+                title = payload.get('title')
+
+                # If the article or 'title' is missing, mark the point for deletion
+                if not payload or title is None:
+                    points_to_delete.append(point.id)
+                    deleted_article_ids.add(payload.get('article_id'))
+                    continue
 
-            # Check for duplicates based on 'title'
-            if title in title_to_point_id:
-                points_to_delete.append(point.id)
-            else:
-                title_to_point_id[title] = point.id
-
-        if points_to_delete:
-            self.client.delete(
-                collection_name=self.collection_name,
-                points_selector=qdrant_client.http.models.PointIdsList(
-                    points=points_to_delete
-                )
-            )
-            print(
-                f"Removed {len(points_to_delete)} points (including duplicates and invalid entries) from the vector store.")
+                # Check for duplicates based on 'title'
+                title_digest = hashlib.blake2b(title.encode("utf-8"), digest_size=16).digest()
+                if title_digest in kept_by_title:
+                    points_to_delete.append(point.id)
+                    # the same article indexed twice keeps its stored document
+                    if payload.get('article_id') != kept_by_title[title_digest]:
+                        deleted_article_ids.add(payload.get('article_id'))
+                else:
+                    kept_by_title[title_digest] = payload.get('article_id')
+
+            if points_to_delete:
+                self.vector_backend.delete(points_to_delete)
+                if self.document_store is not None:
+                    self.document_store.delete_many(list(deleted_article_ids - {None}))
+                removed += len(points_to_delete)
+                removed_article_ids |= deleted_article_ids
+
+        if removed:
+            print(f"Removed {removed} points (including duplicates and invalid entries) from the vector store.")
         else:
             print("No duplicate or invalid points found in the vector store.")
-
+        return removed_article_ids - {None}
+
+    def reembed_points(self, batch_size=256):
+        """
+        Embed the summaries of all points again with the current embed model (e.g. after a model
+        change), one page of points and one vector update request at a time.
+        """
+        updated = 0
+        for points in self.vector_backend.iter_points(batch_size, with_payload=SEARCH_PAYLOAD):
+            summaries = {point.id: point_article(point.payload).get('summary') for point in points}
+            ids = [point_id for point_id, summary in summaries.items() if summary]
+            if not ids:
+                continue
+            embeddings = self.embed_model.get_text_embedding_batch([summaries[point_id] for point_id in ids])
+            self.vector_backend.update_vectors(ids, embeddings)
+            updated += len(ids)
+        print(f"Re-embedded {updated} points.")
+
+    def migrate_payloads(self, batch_size=256):
+        """
+        Move the points that carry the whole article (full_object) to the compact payload, writing
+        their articles to the document store. Points already migrated are left untouched.
+        """
+        migrated = 0
+        for points in self.vector_backend.iter_points(batch_size):
+            legacy = [point for point in points if point.payload and "full_object" in point.payload]
+            if not legacy:
+                continue
+            if self.document_store is not None:
+                self.document_store.put_many([point.payload["full_object"] for point in legacy])
+            self.vector_backend.overwrite_payloads(
+                [point.id for point in legacy], [compact_point_payload(point.payload) for point in legacy]
+            )
+            migrated += len(legacy)
+        print(f"Migrated {migrated} points to the compact payload.")
+
+    def fetch_articles(self, payloads):
+        """
+        Full articles of the ranked points, fetched from the document store with one query. Points
+        that carry the whole article (full_object) or are missing from the store keep their payload.
+        """
+        found = self.document_store.get_many(
+            [payload['article_id'] for payload in payloads if payload.get('article_id')]
+        ) if self.document_store is not None else {}
+        return [
+            found.get(payload.get('article_id')) or payload.get('full_object') or payload
+            for payload in payloads
+        ]
 
     def find_top_m_popular_articles(self, n, k, m, electric_car_weight=1.0):
-        electric_car_articles = self.find_electric_cars_articles(n)
+        return self.fetch_articles([article['payload'] for article in self.rank_popular_articles(n, k, m, electric_car_weight)])
+
+    def rank_popular_articles(self, n, k, m, electric_car_weight=1.0):
+        """
+        top m of the n articles closest to "Electric car", scored by the similarity to their k nearest
+        neighbors and to "Electric car". Returns dicts with the point payload, embedding and total score.
+        """
+        electric_car_articles = self.find_electric_cars_articles(n, with_vectors=self.use_stored_vectors)
         if not electric_car_articles:
             raise ValueError("No articles related to 'Electric car' found.")
 
         # Get the embedding for "Electric car" once to reuse
         electric_car_embedding = self.embed_model.get_text_embedding("Electric car")
 
-        article_scores = []
-
+        candidates = []
         for idx, article_point in enumerate(electric_car_articles):
             try:
                 article_embedding, summary = self.get_article_embedding(article_point)
@@ -228,156 +396,279 @@ class IndexBuilder:
                 print(f"Article at index {idx} has no embedding. Skipping.")
                 continue
 
-            # Find nearest documents to the article
-            search_results = self.find_nearest_documents(article_embedding, top_k=k)
+            candidates.append((article_point, article_embedding))
+
+        # Find nearest documents to every article, only their scores are needed
+        neighbors = self.find_nearest_documents_batch(
+            [article_embedding for _, article_embedding in candidates], top_k=k, with_payload=False
+        )
+
+        # Compute similarity of every article to "Electric car" at once
+        similarities_to_electric_car = (
+            EmbeddingMatrix([article_embedding for _, article_embedding in candidates]).similarities(electric_car_embedding)
+            if candidates else []
+        )
+
+        article_scores = []
 
+        for (article_point, article_embedding), search_results, similarity_to_electric_car in zip(
+            candidates, neighbors, similarities_to_electric_car
+        ):
             # Sum similarities to nearest neighbors
             sum_similarity = sum(hit.score for hit in search_results if hasattr(hit, 'score'))
 
-            # Compute similarity to "Electric car"
-            similarity_to_electric_car = self.compute_similarity(article_embedding, electric_car_embedding)
-
             # Compute total score with controllable weight
             total_score = sum_similarity + electric_car_weight * similarity_to_electric_car
 
             print(f"Article ID {article_point.id} - Sum of similarity scores: {sum_similarity}, "
                   f"Similarity to 'Electric car': {similarity_to_electric_car}, Total Score: {total_score}")
 
-            article_payload = article_point.payload.get('full_object')
-            if article_payload:
+            article_payload = article_point.payload
+            if point_article(article_payload):
                 article_scores.append({
                     'payload': article_payload,
+                    'embedding': article_embedding,
                     'total_score': total_score
                 })
 
         if not article_scores:
             raise ValueError("No articles with valid similarity scores found.")
 
-        # Sort articles by total score
-        sorted_articles = sorted(article_scores, key=lambda x: x['total_score'], reverse=True)
-
-        top_m_articles = sorted_articles[:m]
+        # Top m articles by total score
+        top_m_articles = [
+            article_scores[idx]
+            for idx in top_k(np.array([article['total_score'] for article in article_scores]), m)
+        ]
 
         print(f"Top {m} popular articles determined based on total scores.")
 
-        return [article['payload'] for article in top_m_articles]
+        return top_m_articles
 
-    def retrieve_clusters_top_m_popular_articles(self, n, k, m, electric_car_weight=1.0):
+    def build_popular_clusters(self, n, k, m, electric_car_weight=1.0):
+        """
+        the k nearest neighbors of each of the top m popular articles, re-ranked by similarity to
+        "Electric car". Returns one list of article objects per cluster, fetched in bulk after ranking.
+        """
         electric_car_weight = electric_car_weight * 2 * k
-        top_m_popular_articles = self.find_top_m_popular_articles(n=n, k=k, m=m, electric_car_weight=electric_car_weight)
+        top_m_popular_articles = self.rank_popular_articles(n=n, k=k, m=m, electric_car_weight=electric_car_weight)
         if not top_m_popular_articles:
             raise ValueError("No popular articles found.")
 
         # Get the embedding for "Electric car" once to reuse
         electric_car_embedding = self.embed_model.get_text_embedding("Electric car")
 
-        search_results = []
+        ranked_clusters = []
 
-        for idx, article_payload in enumerate(top_m_popular_articles):
-            try:
-                summary = article_payload.get('extracted_data', {}).get('summary', '')
-                if not summary:
-                    print(f"Popular article at index {idx} is missing 'extracted_data.summary'. Skipping.")
+        # Find nearest documents to every popular article
+        neighbors = self.find_nearest_documents_batch(
+            [article['embedding'] for article in top_m_popular_articles], top_k=k, with_vectors=self.use_stored_vectors
+        )
+
+        for search_results_raw in neighbors:
+            results = []
+            result_embeddings = []
+            for result in search_results_raw:
+                result_summary = point_article(result.payload).get('summary', '')
+                if not result_summary:
                     continue
 
-                article_embedding = self.embed_model.get_text_embedding(summary)
-            except Exception as e:
-                print(f"Skipping popular article at index {idx} due to error: {e}")
-                continue
+                result_embedding = stored_vector(result) if self.use_stored_vectors else None
+                if result_embedding is None:
+                    try:
+                        result_embedding = self.embed_model.get_text_embedding(result_summary)
+                    except Exception as e:
+                        print(f"Skipping result due to error in embedding: {e}")
+                        continue
 
-            if article_embedding is None:
-                print(f"Popular article at index {idx} has no embedding. Skipping.")
+                results.append(result)
+                result_embeddings.append(result_embedding)
+
+            if not results:
                 continue
 
-            # Find nearest documents to the article
-            search_results_raw = self.find_nearest_documents(article_embedding, top_k=k)
+            # Adjust the scores with the weighted similarity to "Electric car", computed at once
+            similarities_to_electric_car = EmbeddingMatrix(result_embeddings).similarities(electric_car_embedding)
+            adjusted_scores = np.array([result.score for result in results]) + electric_car_weight * similarities_to_electric_car
 
-            adjusted_results = []
-            for result in search_results_raw:
-                result_payload = result.payload.get('full_object')
-                if not result_payload:
+            # Sort the adjusted results
+            ranked_clusters.append([results[idx].payload for idx in top_k(adjusted_scores, len(results))])
+
+        return self.fetch_clusters(ranked_clusters)
+
+    def fetch_clusters(self, ranked_clusters):
+        """
+        the full articles of clusters of point payloads, fetched for all clusters at once
+        """
+        articles = iter(self.fetch_articles([payload for cluster in ranked_clusters for payload in cluster]))
+        return [[next(articles) for _ in cluster] for cluster in ranked_clusters]
+
+    def load_recent_vectors(self, max_age_days=7, batch_size=1000):
+        """
+        Unit length vectors and payloads of the points published in the last `max_age_days` days
+        (all points if None, points without a publication date are kept), read page by page.
+        """
+        since = time.time() - max_age_days * 86400 if max_age_days is not None else None
+        pages = []
+        payloads = []
+        for points in self.vector_backend.iter_points(batch_size, with_payload=SEARCH_PAYLOAD, with_vectors=True):
+            vectors = []
+            for point in points:
+                payload = point_article(point.payload)
+                vector = stored_vector(point)
+                if vector is None or not payload.get('summary'):
                     continue
-
-                result_summary = result_payload.get('extracted_data', {}).get('summary', '')
-                if not result_summary:
+                if since is not None and payload.get('published') is not None and payload['published'] < since:
                     continue
+                vectors.append(vector)
+                payloads.append(point.payload)
+            if vectors:
+                pages.append(normalize_rows(vectors))
 
-                try:
-                    result_embedding = self.embed_model.get_text_embedding(result_summary)
-                except Exception as e:
-                    print(f"Skipping result due to error in embedding: {e}")
-                    continue
+        vectors = np.concatenate(pages) if pages else np.empty((0, 0), dtype=np.float32)
+        return vectors, payloads
 
-                # Compute similarity to "Electric car"
-                similarity_to_electric_car = self.compute_similarity(result_embedding, electric_car_embedding)
+    def build_batch_clusters(
+        self,
+        m=3,
+        max_articles=10,
+        max_age_days=7,
+        n_clusters=None,
+        topic="Electric car",
+        topic_weight=1.0,
+        min_cluster_size=2,
+    ):
+        """
+        Cluster all recent articles with spherical mini-batch k-means over their stored vectors and
+        return the articles of the top m clusters, ranked by size, density and similarity to the
+        topic. Every article is in at most one cluster, most central articles first.
+        """
+        vectors, payloads = self.load_recent_vectors(max_age_days)
+        if not payloads:
+            raise ValueError("No recent articles found.")
+
+        kmeans = MiniBatchKMeans(n_clusters or default_cluster_count(len(payloads))).fit(vectors)
+        labels, similarities = kmeans.predict(vectors)
+
+        topic_embedding = self.embed_model.get_text_embedding(topic) if topic else None
+        ranked = rank_clusters(vectors, labels, similarities, topic_embedding, topic_weight, min_cluster_size)[:m]
+        for cluster in ranked:
+            print(f"Cluster of {cluster.size} articles - density: {cluster.density}, "
+                  f"similarity to '{topic}': {cluster.topic_similarity}, score: {cluster.score}")
+
+        return self.fetch_clusters([[payloads[row] for row in cluster.rows[:max_articles]] for cluster in ranked])
+
+    def retrieve_batch_clusters(self, m=3, max_articles=10, max_age_days=7, topic="Electric car", topic_weight=1.0):
+        clusters = self.describe_clusters(
+            self.build_batch_clusters(m, max_articles, max_age_days, topic=topic, topic_weight=topic_weight)
+        )
+        print(f"Retrieved the top {m} clusters of the recent articles.")
+        return clusters
 
-                # Adjust the score with the weight
-                adjusted_score = result.score + electric_car_weight * similarity_to_electric_car
+    def retrieve_clusters_top_m_popular_articles(self, n, k, m, electric_car_weight=1.0):
+        search_results = self.describe_clusters(self.build_popular_clusters(n, k, m, electric_car_weight))
+        print(f"Retrieved clusters for top {m} popular articles.")
+        return search_results
 
-                adjusted_results.append((result, adjusted_score))
+    def generate_cluster_title(self, idx, titles):
+        titles_list = "\n".join(f"- {title}" for title in titles)
 
-            # Sort the adjusted results
-            adjusted_results.sort(key=lambda x: x[1], reverse=True)
+        # Assuming 'llm' is defined or passed appropriately
+        text_generator = TextGenerator(llm)
 
-            # Build the cluster
-            cleaned_search_result = []
-            cluster = {}
-            for result, adjusted_score in adjusted_results:
-                full_object = result.payload.get('full_object')
-                if full_object:
-                    cleaned_search_result.append(full_object)
-
-            if not cleaned_search_result:
-                continue
+        input_data = TextGenerator.InputModel(
+            system_prompt=(
+                "You are a creative assistant. Below is a list of titles grouped into a cluster:\n\n"
+                f"{titles_list}\n\n"
+                "Your task is to come up with a single, cohesive title that represents the entire cluster of titles."
+            ),
+            user_prompt="What is the most appropriate title for the cluster as a whole? Provide only the title."
+        )
+        print('title list:', titles_list)
+        try:
+            generated_text = text_generator.generate_text(input_data)
+            title = generated_text.content.strip()
+            print("cluster title:", title)
+            return title
+        except Exception as e:
+            print(f"Failed to generate title for cluster {idx}: {e}")
+            return "Untitled Cluster"
+
+    def update_online_clusters(self, clusterer, removed_article_ids=()):
+        """
+        Assign the processed documents the clusterer has not seen yet to the online clusters, leaving
+        out `removed_article_ids` (e.g. the title duplicates of remove_duplicate_points_by_title).
+        Their embeddings come from the embed model again, which is a cache lookup with the
+        CachedEmbedding used by default.
+        """
+        removed_article_ids = set(removed_article_ids)
+        documents = {
+            document.metadata["article_id"]: document
+            for document in self.documents
+            if document.metadata["article_id"] not in removed_article_ids
+        }
+        documents = [documents[article_id] for article_id in clusterer.unseen(list(documents))]
+        print(f"Assigning {len(documents)} new of {len(self.documents)} processed documents to the online clusters.")
+        if not documents:
+            return []
+        embeddings = self.embed_model.get_text_embedding_batch([document.get_content() for document in documents])
+        return clusterer.add_many(
+            [document.metadata["article_id"] for document in documents],
+            embeddings,
+            [document.metadata for document in documents],
+        )
 
-            cluster["cluster"] = cleaned_search_result
+    def publish_online_clusters(self, clusterer, m=3, max_articles=10):
+        """
+        Publish the top m online clusters as {cluster, title, image} entries for the backend. A title
+        is only generated again once less than half of the cluster's top articles are the ones it
+        was generated for.
+        """
+        top_clusters = clusterer.top_clusters(m, max_articles)
+        clusters = self.fetch_clusters([payloads for _, payloads in top_clusters])
 
-            titles = [element.get('title', 'Untitled') for element in cleaned_search_result]
+        search_results = []
+        for idx, ((online_cluster, payloads), articles) in enumerate(zip(top_clusters, clusters)):
+            member_ids = [payload.get("article_id") for payload in payloads]
+            titled_ids = set(json.loads(online_cluster.title_members)) if online_cluster.title_members else set()
+            if online_cluster.title is None or len(titled_ids & set(member_ids)) * 2 < len(member_ids):
+                title = self.generate_cluster_title(idx, [article.get('title', 'Untitled') for article in articles])
+                clusterer.set_title(online_cluster, title, json.dumps(member_ids))
 
-            titles_list = "\n".join(f"- {title}" for title in titles)
+            search_results.append({"cluster": articles, "title": online_cluster.title, "image": cluster_image(articles)})
 
-            # Assuming 'llm' is defined or passed appropriately
-            text_generator = TextGenerator(llm)
+        clusterer.publish(search_results)
+        print(f"Published {len(search_results)} online clusters.")
+        return search_results
 
-            input_data = TextGenerator.InputModel(
-                system_prompt=(
-                    "You are a creative assistant. Below is a list of titles grouped into a cluster:\n\n"
-                    f"{titles_list}\n\n"
-                    "Your task is to come up with a single, cohesive title that represents the entire cluster of titles."
-                ),
-                user_prompt="What is the most appropriate title for the cluster as a whole? Provide only the title."
-            )
-            print('title list:', titles_list)
-            try:
-                generated_text = text_generator.generate_text(input_data)
-                cluster["title"] = generated_text.content.strip()
-                print("cluster title:", cluster["title"])
-            except Exception as e:
-                print(f"Failed to generate title for cluster {idx}: {e}")
-                cluster["title"] = "Untitled Cluster"
-
-            # Get image from the first document
-            first_document = cleaned_search_result[0]
-            media_content = first_document.get("media_content", [])
-            image_url = media_content[0].get("url", "") if media_content else ""
-            cluster["image"] = image_url
+    def describe_clusters(self, clusters):
+        """
+        the {cluster, title, image} entries of clusters.json, with an llm generated title per cluster
+        """
+        search_results = []
+
+        for idx, cleaned_search_result in enumerate(clusters):
+            # Build the cluster
+            cluster = {"cluster": cleaned_search_result}
+
+            titles = [element.get('title', 'Untitled') for element in cleaned_search_result]
+            cluster["title"] = self.generate_cluster_title(idx, titles)
+            cluster["image"] = cluster_image(cleaned_search_result)
 
             search_results.append(cluster)
 
         if not search_results:
             raise ValueError("No clusters were successfully retrieved.")
 
-        print(f"Retrieved clusters for top {m} popular articles.")
-
         return search_results
 
 
-def add_to_database(json_file_path):
+def add_to_database(json_file_path, vector_backend=None, online_clusters_path="online_clusters.sqlite3"):
     collection_name = "news_feed"
 
     index_builder = IndexBuilder(
         json_file_path=json_file_path,
         collection_name=collection_name,
+        vector_backend=vector_backend,
     )
 
     data = index_builder.load_data()
@@ -385,15 +676,35 @@ def add_to_database(json_file_path):
 
     index_builder.build_storage_context()
     index_builder.build_index()
-    index_builder.remove_duplicate_points_by_title()
+    removed_article_ids = index_builder.remove_duplicate_points_by_title()
 
-def get_clusters():
+    # the new articles update the live clusters served by the backend, without re-clustering
+    if online_clusters_path:
+        clusterer = OnlineClusterer(
+            online_clusters_path, topic_embedding=index_builder.embed_model.get_text_embedding("Electric car")
+        )
+        index_builder.update_online_clusters(clusterer, removed_article_ids)
+        index_builder.publish_online_clusters(clusterer)
+        clusterer.close()
+
+def get_clusters(n=10, k=5, m=3, vector_backend=None):
     collection_name = "news_feed"
 
     index_builder = IndexBuilder(
         collection_name=collection_name,
+        vector_backend=vector_backend,
     )
-    clusters = index_builder.retrieve_clusters_top_m_popular_articles(10, 5, 3)
+    clusters = index_builder.retrieve_clusters_top_m_popular_articles(n, k, m)
+    return clusters
+
+def get_batch_clusters(m=3, max_articles=10, max_age_days=7, vector_backend=None):
+    collection_name = "news_feed"
+
+    index_builder = IndexBuilder(
+        collection_name=collection_name,
+        vector_backend=vector_backend,
+    )
+    clusters = index_builder.retrieve_batch_clusters(m, max_articles, max_age_days)
     return clusters
 
 
@@ -0,0 +1,94 @@
+import calendar
+import json
+import sqlite3
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, List, Optional
+
+# keys of the compact payload stored with every vector point
+PAYLOAD_FIELDS = ["article_id", "title", "published", "image", "summary"]
+
+
+def article_key(article: Dict) -> str:
+    """
+    key of the article in the document store, the feed entry id or the link when the entry has none
+    """
+    article_id = article.get("id")
+    if article_id and article_id != "No ID":
+        return str(article_id)
+    return article.get("link", "")
+
+
+def published_timestamp(article: Dict) -> Optional[int]:
+    """
+    publication time as a unix timestamp, from published_parsed or the published date string
+    """
+    published_parsed = article.get("published_parsed")
+    if published_parsed:
+        return calendar.timegm(tuple(published_parsed[:6]) + (0, 0, 0))
+    try:
+        return int(parsedate_to_datetime(article.get("published", "")).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+def compact_payload(article: Dict) -> Dict:
+    """
+    the fields of the article needed to rank and show it, without the scraped content and rss html
+    """
+    media_content = article.get("media_content") or []
+    return {
+        "article_id": article_key(article),
+        "title": article.get("title"),
+        "published": published_timestamp(article),
+        "image": media_content[0].get("url", "") if media_content else "",
+        "summary": article.get("extracted_data", {}).get("summary", ""),
+    }
+
+
+class DocumentStore:
+    """
+    Full article objects in SQLite, keyed by article_key, fetched in bulk after ranking.
+    """
+
+    def __init__(self, path: str = "documents.sqlite3"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, document TEXT NOT NULL)")
+
+    def put_many(self, articles: Iterable[Dict]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO documents (id, document) VALUES (?, ?)",
+                [(article_key(article), json.dumps(article, ensure_ascii=False)) for article in articles],
+            )
+
+    def get_many(self, ids: List[str]) -> Dict[str, Dict]:
+        """
+        stored articles of the given ids, by id (ids that are not stored are left out)
+        """
+        ids = list(dict.fromkeys(ids))
+        found = {}
+        with self._lock:
+            # SQLite limits the number of bound parameters, look up in slices
+            for start in range(0, len(ids), 500):
+                part = ids[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT id, document FROM documents WHERE id IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                found.update({id: json.loads(document) for id, document in rows})
+        return found
+
+    def delete_many(self, ids: List[str]):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM documents WHERE id = ?", [(id,) for id in ids])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
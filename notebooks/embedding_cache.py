@@ -0,0 +1,153 @@
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from pydantic import PrivateAttr
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def model_key(embed_model: BaseEmbedding, deployment: Optional[str] = None) -> str:
+    """
+    key of the embed model in the cache, the model name plus the deployment and the output dimensions
+    when they are set (an Azure deployment passed as engine leaves the default model name in place)
+    """
+    deployment = deployment or getattr(embed_model, "azure_deployment", None)
+    dimensions = getattr(embed_model, "dimensions", None)
+    key = embed_model.model_name
+    if deployment:
+        key += f"|deployment={deployment}"
+    if dimensions:
+        key += f"|dimensions={dimensions}"
+    return key
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache in SQLite, vectors stored as float32 blobs keyed by
+    model key, kind (text or query) and the hash of the text.
+    """
+
+    def __init__(self, path: str = "embedding_cache.sqlite3"):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, kind TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, kind, hash))"
+            )
+
+    def get_many(self, model: str, kind: str, texts: List[str]) -> Dict[str, Embedding]:
+        """
+        cached embeddings of the given texts, by text hash
+        """
+        hashes = list(dict.fromkeys(text_hash(text) for text in texts))
+        found = {}
+        with self._lock:
+            # SQLite limits the number of bound parameters, look up in slices
+            for start in range(0, len(hashes), 500):
+                part = hashes[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND kind = ? AND hash IN ({','.join('?' * len(part))})",
+                    [model, kind, *part],
+                ).fetchall()
+                found.update({row[0]: np.frombuffer(row[1], dtype=np.float32).tolist() for row in rows})
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def set_many(self, model: str, kind: str, texts: List[str], embeddings: List[Embedding]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, kind, hash, vector) VALUES (?, ?, ?, ?)",
+                [
+                    (model, kind, text_hash(text), np.asarray(embedding, dtype=np.float32).tobytes())
+                    for text, embedding in zip(texts, embeddings)
+                ],
+            )
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+    def close(self):
+        self._conn.close()
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Wraps an embed model, only texts that are not in the cache are sent to it.
+    Can be used everywhere the wrapped model is used (Settings.embed_model, VectorStoreIndex).
+    Pass the deployment when the wrapped model does not expose it (see model_key).
+    """
+
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+    _model_key: str = PrivateAttr()
+
+    def __init__(self, embed_model: BaseEmbedding, cache: EmbeddingCache, deployment: Optional[str] = None, **kwargs):
+        super().__init__(
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            **kwargs,
+        )
+        self._embed_model = embed_model
+        self._cache = cache
+        self._model_key = model_key(embed_model, deployment)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def cache(self) -> EmbeddingCache:
+        return self._cache
+
+    def _cached(self, kind: str, texts: List[str], embed) -> List[Embedding]:
+        found = self._cache.get_many(self._model_key, kind, texts)
+        missing = list(dict.fromkeys(text for text in texts if text_hash(text) not in found))
+        if missing:
+            embeddings = embed(missing)
+            self._cache.set_many(self._model_key, kind, missing, embeddings)
+            found.update({text_hash(text): embedding for text, embedding in zip(missing, embeddings)})
+        return [found[text_hash(text)] for text in texts]
+
+    async def _acached(self, kind: str, texts: List[str], aembed) -> List[Embedding]:
+        found = self._cache.get_many(self._model_key, kind, texts)
+        missing = list(dict.fromkeys(text for text in texts if text_hash(text) not in found))
+        if missing:
+            embeddings = await aembed(missing)
+            self._cache.set_many(self._model_key, kind, missing, embeddings)
+            found.update({text_hash(text): embedding for text, embedding in zip(missing, embeddings)})
+        return [found[text_hash(text)] for text in texts]
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._cached("query", [query], lambda texts: [self._embed_model.get_query_embedding(texts[0])])[0]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        async def aembed(texts):
+            return [await self._embed_model.aget_query_embedding(texts[0])]
+
+        return (await self._acached("query", [query], aembed))[0]
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return self._cached("text", texts, self._embed_model.get_text_embedding_batch)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return await self._acached("text", texts, self._embed_model.aget_text_embedding_batch)
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def entry_key(entry) -> str:
+    return entry.get("id") or entry.get("link", "")
+
+
+def entry_hash(entry) -> str:
+    """
+    hash of the feed entry itself, changes when the publisher edits the entry
+    """
+    return hash_text(json.dumps([
+        entry.get("title", ""),
+        entry.get("link", ""),
+        entry.get("summary", ""),
+        entry.get("published", ""),
+        entry.get("updated", ""),
+    ]))
+
+
+class FeedLedger:
+    """
+    SQLite ledger of processed feeds and entries.
+
+    - feeds: ETag/Last-Modified of the last successful fetch, for conditional requests
+    - entries: entry hash, content hash and extracted data of every processed entry, so unchanged
+      entries are neither downloaded nor extracted again
+    """
+
+    def __init__(self, path: str = "feed_ledger.sqlite3"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS feeds ("
+                "url TEXT PRIMARY KEY, etag TEXT, modified TEXT, fetched_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, link TEXT, entry_hash TEXT NOT NULL, content_hash TEXT NOT NULL, "
+                "extracted_data TEXT, processed_at REAL NOT NULL)"
+            )
+
+    def get_feed_validators(self, url: str) -> Tuple[Optional[str], Optional[str]]:
+        with self._lock:
+            row = self._conn.execute("SELECT etag, modified FROM feeds WHERE url = ?", (url,)).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def set_feed_validators(self, url: str, etag: Optional[str], modified: Optional[str]):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO feeds (url, etag, modified, fetched_at) VALUES (?, ?, ?, ?)",
+                (url, etag, modified, time.time()),
+            )
+
+    def is_unchanged(self, entry) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT entry_hash FROM entries WHERE key = ?", (entry_key(entry),)).fetchone()
+        return row is not None and row[0] == entry_hash(entry)
+
+    def get_extraction(self, entry, content_hash: str) -> Optional[Dict]:
+        """
+        previously extracted data of this entry, if its article content did not change
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT extracted_data FROM entries WHERE key = ? AND content_hash = ?",
+                (entry_key(entry), content_hash),
+            ).fetchone()
+        if not row or not row[0]:
+            return None
+        return json.loads(row[0])
+
+    def record(self, entry, content_hash: str, extracted_data: Optional[Dict]):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, link, entry_hash, content_hash, extracted_data, processed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    entry_key(entry),
+                    entry.get("link", ""),
+                    entry_hash(entry),
+                    content_hash,
+                    json.dumps(extracted_data) if extracted_data else None,
+                    time.time(),
+                ),
+            )
+
+    def close(self):
+        self._conn.close()
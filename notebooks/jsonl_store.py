@@ -0,0 +1,90 @@
+import json
+import os
+import time
+from typing import Dict, Iterable, Iterator
+
+
+class JsonlWriter:
+    """
+    Appends one JSON object per line as soon as it is written.
+
+    Every line is flushed to the OS immediately, so a crashed run keeps everything written so far.
+    fsync (durability against power loss) is batched: every `fsync_every` lines or `fsync_interval` seconds.
+    """
+
+    def __init__(self, path: str, fsync_every: int = 20, fsync_interval: float = 5.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._open()
+
+    def _open(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def write(self, entry: Dict):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def write_all(self, entries: Iterable[Dict]) -> int:
+        count = 0
+        for entry in entries:
+            self.write(entry)
+            count += 1
+        return count
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if self._file is not None and not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_jsonl(path: str) -> Iterator[Dict]:
+    """
+    Stream the objects of a JSONL file. A truncated last line (interrupted run) is skipped.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Skipping invalid line {line_number} in {path}")
+
+
+def iter_entries(path: str) -> Iterator[Dict]:
+    """
+    Stream entries from a .jsonl file, or from a .json file containing a list (loaded at once).
+    """
+    if path.endswith(".jsonl"):
+        yield from iter_jsonl(path)
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError("JSON data must be a list of objects.")
+    yield from data
+
@@ -0,0 +1,136 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import zlib
+from typing import List, Optional, Set
+
+import numpy as np
+
+# Mersenne prime for the universal hash functions (a * x + b) mod p, keeps a * x inside uint64
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+def shingles(text: str, size: int = 5) -> Set[int]:
+    """
+    crc32 hashes of the word `size`-grams of the normalized text
+    """
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        words = words + [""] * (size - len(words))
+    return {
+        zlib.crc32(" ".join(words[idx:idx + size]).encode("utf-8"))
+        for idx in range(len(words) - size + 1)
+    }
+
+
+class NearDuplicateIndex:
+    """
+    MinHash LSH index of article contents, persisted in SQLite.
+
+    Every text gets a MinHash signature of `num_perm` values over its word shingles. The signature
+    is split into `bands` bands, texts that share a band hash are candidates and a candidate is a
+    near duplicate if the estimated Jaccard similarity is at least `threshold`. A lookup only reads
+    the candidates of its band hashes, so it does not grow with the size of the corpus.
+
+    Texts are only added once they were written, items still in flight can be tracked in a
+    `pending` index (same parameters, in memory) and removed from it if they fail.
+    """
+
+    def __init__(
+        self,
+        path: str = "near_duplicates.sqlite3",
+        num_perm: int = 128,
+        bands: int = 16,
+        threshold: float = 0.8,
+        shingle_size: int = 5,
+        seed: int = 1,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands.")
+        self.path = path
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.seed = seed
+
+        # the same seed gives the same hash functions, so stored signatures stay comparable
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS signatures (key TEXT PRIMARY KEY, signature BLOB NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS bands (band INTEGER NOT NULL, hash TEXT NOT NULL, key TEXT NOT NULL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS bands_lookup ON bands (band, hash)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS bands_key ON bands (key)")
+
+    def signature(self, text: str) -> np.ndarray:
+        values = np.fromiter(shingles(text, self.shingle_size), dtype=np.uint64) % MERSENNE_PRIME
+        hashes = (np.outer(values, self._a) + self._b) % MERSENNE_PRIME
+        return hashes.min(axis=0).astype(np.uint32)
+
+    def _band_hashes(self, signature: np.ndarray) -> List[str]:
+        return [
+            hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8).hexdigest()
+            for band in range(self.bands)
+        ]
+
+    def _find(self, key: Optional[str], signature: np.ndarray, band_hashes: List[str]) -> Optional[str]:
+        candidates = set()
+        for band, band_hash in enumerate(band_hashes):
+            rows = self._conn.execute("SELECT key FROM bands WHERE band = ? AND hash = ?", (band, band_hash)).fetchall()
+            candidates.update(row[0] for row in rows)
+        candidates.discard(key)
+
+        for candidate in candidates:
+            row = self._conn.execute("SELECT signature FROM signatures WHERE key = ?", (candidate,)).fetchone()
+            if row and np.mean(np.frombuffer(row[0], dtype=np.uint32) == signature) >= self.threshold:
+                return candidate
+        return None
+
+    def check(self, key: Optional[str], text: str) -> Optional[str]:
+        """
+        key of an indexed near duplicate of the text (other than `key` itself), if there is one
+        """
+        signature = self.signature(text)
+        with self._lock:
+            return self._find(key, signature, self._band_hashes(signature))
+
+    def add(self, key: str, text: str):
+        signature = self.signature(text)
+        with self._lock, self._conn:
+            self._add(key, signature, self._band_hashes(signature))
+
+    def _add(self, key: str, signature: np.ndarray, band_hashes: List[str]):
+        self._conn.execute("DELETE FROM bands WHERE key = ?", (key,))
+        self._conn.execute("INSERT OR REPLACE INTO signatures (key, signature) VALUES (?, ?)", (key, signature.tobytes()))
+        self._conn.executemany(
+            "INSERT INTO bands (band, hash, key) VALUES (?, ?, ?)",
+            [(band, band_hash, key) for band, band_hash in enumerate(band_hashes)],
+        )
+
+    def remove(self, key: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM bands WHERE key = ?", (key,))
+            self._conn.execute("DELETE FROM signatures WHERE key = ?", (key,))
+
+    def pending(self) -> "NearDuplicateIndex":
+        """
+        an empty in-memory index with the same parameters, for the texts that are not written yet
+        """
+        return NearDuplicateIndex(
+            ":memory:", num_perm=self.num_perm, bands=self.bands, threshold=self.threshold,
+            shingle_size=self.shingle_size, seed=self.seed,
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,359 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from clustering import MiniBatchKMeans
+from similarity import normalize_rows, top_k
+
+
+class OnlineCluster:
+    """
+    A cluster of the online clusterer: decayed sum of its member vectors and decayed member count.
+    """
+
+    __slots__ = ("id", "sum", "weight", "updated_at", "title", "title_members")
+
+    def __init__(self, id: int, sum: np.ndarray, weight: float, updated_at: float, title: Optional[str] = None, title_members: Optional[str] = None):
+        self.id = id
+        self.sum = sum
+        self.weight = weight
+        self.updated_at = updated_at
+        # llm title and the members it was generated for, generated again when the top members change
+        self.title = title
+        self.title_members = title_members
+
+    def __repr__(self) -> str:
+        return f"OnlineCluster(id={self.id}, weight={self.weight:.2f})"
+
+
+class OnlineClusterer:
+    """
+    Incremental clustering of newly indexed articles, persisted in SQLite.
+
+    Every article is assigned to the closest cluster centroid if its cosine similarity is at least
+    `assign_threshold`, otherwise it starts a new cluster. The centroid is updated in place, as the
+    normalized sum of the member vectors, with weights that halve every `half_life` seconds. The
+    number of clusters is bounded by `max_clusters` and every cluster keeps its `max_members` most
+    recent members, so an article costs O(max_clusters * dim) however large the corpus is. Every
+    assigned article id is remembered, so an article is only counted once even after it was trimmed
+    from its cluster or its cluster was retired.
+
+    `maintain` (run by `add_many` every `maintain_interval` seconds) retires clusters whose decayed
+    weight fell below `retire_weight`, merges clusters whose centroids are closer than
+    `merge_threshold` and splits clusters whose members are less similar than `split_density`
+    to their centroid in two.
+    """
+
+    def __init__(
+        self,
+        path: str = "online_clusters.sqlite3",
+        assign_threshold: float = 0.55,
+        merge_threshold: float = 0.85,
+        split_density: float = 0.6,
+        split_min_members: int = 8,
+        half_life: float = 2 * 24 * 60 * 60,
+        retire_weight: float = 0.5,
+        max_clusters: int = 2000,
+        max_members: int = 50,
+        maintain_interval: float = 60 * 60,
+        topic_embedding=None,
+        topic_weight: float = 1.0,
+    ):
+        self.path = path
+        self.assign_threshold = assign_threshold
+        self.merge_threshold = merge_threshold
+        self.split_density = split_density
+        self.split_min_members = split_min_members
+        self.half_life = half_life
+        self.retire_weight = retire_weight
+        self.max_clusters = max_clusters
+        self.max_members = max_members
+        self.maintain_interval = maintain_interval
+        self.topic_embedding = normalize_rows(topic_embedding)[0] if topic_embedding is not None else None
+        self.topic_weight = topic_weight
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS clusters ("
+                "id INTEGER PRIMARY KEY, sum BLOB NOT NULL, weight REAL NOT NULL, updated_at REAL NOT NULL, "
+                "title TEXT, title_members TEXT)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS members ("
+                "cluster_id INTEGER NOT NULL, article_id TEXT NOT NULL, added_at REAL NOT NULL, "
+                "vector BLOB NOT NULL, payload TEXT NOT NULL, PRIMARY KEY (cluster_id, article_id))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS members_added ON members (cluster_id, added_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS members_article ON members (article_id)")
+            # every article ever assigned, members are trimmed and retired but an article is only counted once
+            self._conn.execute("CREATE TABLE IF NOT EXISTS seen (article_id TEXT PRIMARY KEY, added_at REAL NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            # the published {cluster, title, image} list, read by the backend's /cluster endpoint
+            self._conn.execute("CREATE TABLE IF NOT EXISTS snapshot (id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER NOT NULL, body TEXT NOT NULL)")
+
+        self.clusters: Dict[int, OnlineCluster] = {}
+        for id, sum, weight, updated_at, title, title_members in self._conn.execute(
+            "SELECT id, sum, weight, updated_at, title, title_members FROM clusters"
+        ):
+            self.clusters[id] = OnlineCluster(id, np.frombuffer(sum, dtype=np.float32).copy(), weight, updated_at, title, title_members)
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'maintained_at'").fetchone()
+        self.maintained_at = float(row[0]) if row else 0.0
+        self._refresh_centroids()
+
+    # state
+
+    def _decay(self, cluster: OnlineCluster, now: float) -> float:
+        return 0.5 ** (max(0.0, now - cluster.updated_at) / self.half_life)
+
+    def _age(self, cluster: OnlineCluster, now: float):
+        """
+        apply the time decay to the cluster, the centroid direction does not change
+        """
+        factor = self._decay(cluster, now)
+        cluster.sum = cluster.sum * np.float32(factor)
+        cluster.weight *= factor
+        cluster.updated_at = now
+
+    def _refresh_centroids(self):
+        self._cluster_ids = list(self.clusters)
+        self._rows = {id: row for row, id in enumerate(self._cluster_ids)}
+        self._centroids = (
+            normalize_rows([self.clusters[id].sum for id in self._cluster_ids])
+            if self._cluster_ids else np.empty((0, 0), dtype=np.float32)
+        )
+
+    def _save_cluster(self, cluster: OnlineCluster):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO clusters (id, sum, weight, updated_at, title, title_members) VALUES (?, ?, ?, ?, ?, ?)",
+            (cluster.id, cluster.sum.astype(np.float32).tobytes(), cluster.weight, cluster.updated_at, cluster.title, cluster.title_members),
+        )
+
+    def _new_cluster(self, sum: np.ndarray, weight: float, now: float) -> OnlineCluster:
+        id = max(self.clusters, default=0) + 1
+        cluster = OnlineCluster(id, sum.astype(np.float32), weight, now)
+        self.clusters[id] = cluster
+        return cluster
+
+    def _remove_cluster(self, cluster_id: int):
+        del self.clusters[cluster_id]
+        self._conn.execute("DELETE FROM clusters WHERE id = ?", (cluster_id,))
+        self._conn.execute("DELETE FROM members WHERE cluster_id = ?", (cluster_id,))
+
+    def _trim_members(self, cluster_id: int):
+        self._conn.execute(
+            "DELETE FROM members WHERE cluster_id = ? AND article_id NOT IN "
+            "(SELECT article_id FROM members WHERE cluster_id = ? ORDER BY added_at DESC LIMIT ?)",
+            (cluster_id, cluster_id, self.max_members),
+        )
+
+    def _members(self, cluster_id: int):
+        rows = self._conn.execute(
+            "SELECT article_id, added_at, vector, payload FROM members WHERE cluster_id = ?", (cluster_id,)
+        ).fetchall()
+        vectors = np.array([np.frombuffer(row[2], dtype=np.float32) for row in rows]) if rows else None
+        return rows, vectors
+
+    # updates
+
+    def unseen(self, article_ids: Sequence[str]) -> List[str]:
+        """
+        the ids of the given articles that were never assigned, in the given order
+        """
+        article_ids = [str(article_id) for article_id in article_ids]
+        seen = set()
+        with self._lock:
+            # SQLite limits the number of bound parameters, look up in slices
+            for start in range(0, len(article_ids), 500):
+                part = article_ids[start:start + 500]
+                seen.update(row[0] for row in self._conn.execute(
+                    f"SELECT article_id FROM seen WHERE article_id IN ({','.join('?' * len(part))})", part
+                ))
+        return [article_id for article_id in article_ids if article_id not in seen]
+
+    def add(self, article_id: str, vector, payload: Dict, now: Optional[float] = None) -> Optional[int]:
+        """
+        assign one article, returns the id of its cluster
+        """
+        return self.add_many([article_id], [vector], [payload], now)[0]
+
+    def add_many(
+        self, article_ids: Sequence[str], vectors, payloads: Sequence[Dict], now: Optional[float] = None
+    ) -> List[Optional[int]]:
+        """
+        Assign the articles one after the other (an article can join a cluster started by an earlier
+        one of the batch) and write the batch in one transaction. Runs `maintain` when it is due.
+        Articles that were assigned before are not counted again, their cluster id is returned while
+        they are still a member (None after they were trimmed or their cluster was retired).
+        """
+        now = time.time() if now is None else now
+        vectors = normalize_rows(vectors) if len(article_ids) else []
+        assigned = []
+        with self._lock, self._conn:
+            for article_id, vector, payload in zip(article_ids, vectors, payloads):
+                # an article that was assigned before is not counted twice
+                if self._conn.execute("SELECT 1 FROM seen WHERE article_id = ?", (str(article_id),)).fetchone() is not None:
+                    existing = self._conn.execute("SELECT cluster_id FROM members WHERE article_id = ?", (str(article_id),)).fetchone()
+                    assigned.append(existing[0] if existing is not None else None)
+                    continue
+                self._conn.execute("INSERT INTO seen (article_id, added_at) VALUES (?, ?)", (str(article_id), now))
+
+                cluster = None
+                if self._cluster_ids:
+                    similarities = self._centroids @ vector
+                    best = int(np.argmax(similarities))
+                    if similarities[best] >= self.assign_threshold:
+                        cluster = self.clusters[self._cluster_ids[best]]
+
+                if cluster is None:
+                    # a full set of clusters makes room by retiring the lightest one
+                    if len(self.clusters) >= self.max_clusters:
+                        self._remove_cluster(min(self.clusters.values(), key=lambda c: c.weight * self._decay(c, now)).id)
+                    cluster = self._new_cluster(np.zeros_like(vector), 0.0, now)
+                    self._refresh_centroids()
+
+                self._age(cluster, now)
+                cluster.sum = cluster.sum + vector
+                cluster.weight += 1.0
+                self._centroids[self._rows[cluster.id]] = normalize_rows(cluster.sum)[0]
+                self._save_cluster(cluster)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO members (cluster_id, article_id, added_at, vector, payload) VALUES (?, ?, ?, ?, ?)",
+                    (cluster.id, str(article_id), now, vector.tobytes(), json.dumps(payload, ensure_ascii=False)),
+                )
+                self._trim_members(cluster.id)
+                assigned.append(cluster.id)
+
+        if now - self.maintained_at >= self.maintain_interval:
+            self.maintain(now)
+        return assigned
+
+    def maintain(self, now: Optional[float] = None):
+        """
+        retire faded clusters, merge clusters that converged and split clusters that drifted apart
+        """
+        now = time.time() if now is None else now
+        with self._lock, self._conn:
+            for cluster in list(self.clusters.values()):
+                self._age(cluster, now)
+                if cluster.weight < self.retire_weight:
+                    self._remove_cluster(cluster.id)
+            retired = len(self._cluster_ids) - len(self.clusters)
+
+            merged = self._merge(now)
+            split = self._split(now)
+
+            for cluster in self.clusters.values():
+                self._save_cluster(cluster)
+            self.maintained_at = now
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('maintained_at', ?)", (str(now),))
+            self._refresh_centroids()
+        print(f"Cluster maintenance: {retired} retired, {merged} merged, {split} split, {len(self.clusters)} clusters.")
+
+    def _merge(self, now: float) -> int:
+        self._refresh_centroids()
+        if len(self._cluster_ids) < 2:
+            return 0
+        similarities = self._centroids @ self._centroids.T
+        np.fill_diagonal(similarities, -np.inf)
+        merged = 0
+        for left, right in zip(*np.nonzero(np.triu(similarities >= self.merge_threshold))):
+            left_id, right_id = self._cluster_ids[left], self._cluster_ids[right]
+            if left_id not in self.clusters or right_id not in self.clusters:
+                continue
+            # the lighter cluster moves into the heavier one
+            target, source = sorted((self.clusters[left_id], self.clusters[right_id]), key=lambda c: -c.weight)
+            target.sum = target.sum + source.sum
+            target.weight += source.weight
+            target.title_members = None
+            self._conn.execute(
+                "UPDATE OR REPLACE members SET cluster_id = ? WHERE cluster_id = ?", (target.id, source.id)
+            )
+            self._trim_members(target.id)
+            self._remove_cluster(source.id)
+            merged += 1
+        return merged
+
+    def _split(self, now: float) -> int:
+        split = 0
+        for cluster in list(self.clusters.values()):
+            rows, vectors = self._members(cluster.id)
+            if len(rows) < self.split_min_members:
+                continue
+            if float(np.mean(vectors @ normalize_rows(cluster.sum)[0])) >= self.split_density:
+                continue
+
+            labels, _ = MiniBatchKMeans(2, batch_size=len(rows), iterations=20).fit(vectors).predict(vectors)
+            if labels.min() == labels.max():
+                continue
+            # the decayed weight is shared by the halves in proportion to their members
+            weight = cluster.weight
+            moved = labels == 1
+            cluster.sum = vectors[~moved].sum(axis=0) * np.float32(weight / len(rows))
+            cluster.weight = weight * float(np.mean(~moved))
+            cluster.title_members = None
+            other = self._new_cluster(vectors[moved].sum(axis=0) * np.float32(weight / len(rows)), weight * float(np.mean(moved)), now)
+            self._conn.executemany(
+                "UPDATE members SET cluster_id = ? WHERE cluster_id = ? AND article_id = ?",
+                [(other.id, cluster.id, row[0]) for row, move in zip(rows, moved) if move],
+            )
+            split += 1
+        return split
+
+    # output
+
+    def top_clusters(self, m: int = 3, max_articles: int = 10, now: Optional[float] = None) -> List[tuple]:
+        """
+        The m highest scoring clusters as (cluster, member payloads most central first). Like the batch
+        clustering score, a cluster scores the summed similarity of its members to the centroid (the
+        length of the decayed sum) plus `topic_weight` times its weight and topic similarity.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if not self.clusters:
+                return []
+            self._refresh_centroids()
+            decay = np.array([self._decay(self.clusters[id], now) for id in self._cluster_ids])
+            lengths = np.array([np.linalg.norm(self.clusters[id].sum) for id in self._cluster_ids]) * decay
+            weights = np.array([self.clusters[id].weight for id in self._cluster_ids]) * decay
+            topic_similarities = self._centroids @ self.topic_embedding if self.topic_embedding is not None else 0.0
+            scores = lengths + self.topic_weight * weights * topic_similarities
+
+            result = []
+            for idx in top_k(scores, m):
+                cluster = self.clusters[self._cluster_ids[idx]]
+                rows, vectors = self._members(cluster.id)
+                if len(rows) < 2:
+                    continue
+                order = top_k(vectors @ self._centroids[idx], max_articles)
+                result.append((cluster, [json.loads(rows[row][3]) for row in order]))
+            return result
+
+    def set_title(self, cluster: OnlineCluster, title: str, members: str):
+        with self._lock, self._conn:
+            cluster.title = title
+            cluster.title_members = members
+            self._conn.execute("UPDATE clusters SET title = ?, title_members = ? WHERE id = ?", (title, members, cluster.id))
+
+    def publish(self, clusters: List[Dict]):
+        """
+        store the {cluster, title, image} list served by the backend, with a new version number
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO snapshot (id, version, body) VALUES (0, 1, ?) "
+                "ON CONFLICT (id) DO UPDATE SET version = version + 1, body = excluded.body",
+                (json.dumps(clusters, ensure_ascii=False),),
+            )
+
+    def __len__(self) -> int:
+        return len(self.clusters)
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,62 @@
+from typing import Sequence, Tuple
+
+import numpy as np
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """
+    contiguous float32 matrix with unit length rows (zero rows stay zero)
+    """
+    matrix = np.array(vectors, dtype=np.float32, ndmin=2, order="C")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    indices of the k highest scores, highest first and ties in index order, in O(n + k log k)
+    with a partition instead of a full sort
+    """
+    scores = np.asarray(scores)
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+    above = np.flatnonzero(scores > kth)
+    tied = np.flatnonzero(scores == kth)[:k - len(above)]
+    candidates = np.concatenate([above, tied])
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+
+class EmbeddingMatrix:
+    """
+    Embeddings as one pre-normalized float32 matrix, so cosine similarities are a single matrix multiply.
+    """
+
+    def __init__(self, embeddings: Sequence[Sequence[float]]):
+        self.vectors = normalize_rows(embeddings)
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    def similarities(self, queries) -> np.ndarray:
+        """
+        cosine similarity of every row to the query (shape (n,)) or to every query (shape (n, q))
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        scores = self.vectors @ normalize_rows(queries).T
+        return scores[:, 0] if queries.ndim == 1 else scores
+
+    def top_k(self, query, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        indices and similarities of the k rows closest to the query
+        """
+        scores = self.similarities(query)
+        indices = top_k(scores, k)
+        return indices, scores[indices]
+
+
+def cosine_similarity(embedding1, embedding2) -> float:
+    return float(EmbeddingMatrix([embedding1]).similarities(embedding2)[0])
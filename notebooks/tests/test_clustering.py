@@ -0,0 +1,64 @@
+import numpy as np
+
+from clustering import MiniBatchKMeans, default_cluster_count, rank_clusters
+from similarity import normalize_rows
+
+
+def blobs(sizes, dim: int = 16, noise: float = 0.05, seed: int = 0):
+    """
+    unit length rows around one random direction per blob, and the blob of every row
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(len(sizes), dim))
+    labels = np.repeat(np.arange(len(sizes)), sizes)
+    return normalize_rows(centers[labels] + noise * rng.normal(size=(len(labels), dim))), labels
+
+
+def test_kmeans_recovers_separated_blobs():
+    vectors, truth = blobs([60, 40, 30])
+
+    labels, similarities = MiniBatchKMeans(3, batch_size=64, seed=1).fit(vectors).predict(vectors)
+
+    # every blob maps to exactly one cluster
+    assert len({(t, l) for t, l in zip(truth, labels)}) == 3
+    assert similarities.min() > 0.9
+
+
+def test_kmeans_centroids_are_unit_length_and_capped_by_the_rows():
+    vectors, _ = blobs([3, 2])
+
+    model = MiniBatchKMeans(10).fit(vectors)
+
+    assert model.centroids.shape == (5, 16)
+    assert np.allclose(np.linalg.norm(model.centroids, axis=1), 1.0, atol=1e-5)
+
+
+def test_predict_in_chunks_matches_a_single_chunk():
+    vectors, _ = blobs([50, 50], seed=3)
+    model = MiniBatchKMeans(2).fit(vectors)
+
+    labels, similarities = model.predict(vectors)
+    chunked_labels, chunked_similarities = model.predict(vectors, chunk_size=7)
+
+    assert (labels == chunked_labels).all()
+    assert np.allclose(similarities, chunked_similarities)
+
+
+def test_rank_clusters_puts_large_dense_on_topic_clusters_first():
+    vectors, _ = blobs([30, 10, 1], seed=4)
+    labels, similarities = MiniBatchKMeans(3, seed=1).fit(vectors).predict(vectors)
+
+    ranked = rank_clusters(vectors, labels, similarities)
+
+    # the single row cluster is below min_cluster_size
+    assert [cluster.size for cluster in ranked] == [30, 10]
+    assert np.all(np.diff(similarities[ranked[0].rows]) <= 0)
+
+    topic = vectors[labels == labels[ranked[1].rows[0]]].mean(axis=0)
+    on_topic = rank_clusters(vectors, labels, similarities, topic_embedding=topic, topic_weight=5.0)
+    assert [cluster.size for cluster in on_topic] == [10, 30]
+
+
+def test_default_cluster_count():
+    assert default_cluster_count(50) == 1
+    assert default_cluster_count(1000) == 10
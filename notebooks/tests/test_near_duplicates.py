@@ -0,0 +1,69 @@
+import pytest
+
+from near_duplicates import NearDuplicateIndex
+
+ARTICLE = (
+    "The city council approved the new budget on Tuesday after a long debate about public transport, "
+    "school funding and the renovation of the central library. The mayor said the plan balances the "
+    "needs of every district while keeping taxes stable for the coming two years, and the opposition "
+    "announced it would propose amendments to the transport section during the next session."
+)
+SYNDICATED = "Published by a partner site. " + ARTICLE
+OTHER = (
+    "A late goal from the visiting striker decided the derby, leaving the home side three points behind "
+    "the leaders with only four matches to play in a season marked by injuries and a change of coach."
+)
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "dedup.sqlite3"))
+    yield index
+    index.close()
+
+
+def test_syndicated_copy_is_a_near_duplicate(index):
+    index.add("original", ARTICLE)
+
+    assert index.check("copy", SYNDICATED) == "original"
+    assert index.check("other", OTHER) is None
+
+
+def test_a_text_is_not_a_duplicate_of_itself(index):
+    index.add("original", ARTICLE)
+
+    assert index.check("original", SYNDICATED) is None
+
+
+def test_removed_text_is_no_longer_found(index):
+    index.add("original", ARTICLE)
+    index.remove("original")
+
+    assert index.check("copy", SYNDICATED) is None
+    assert len(index) == 0
+
+
+def test_pending_index_is_separate_and_uses_the_same_hashes(index):
+    pending = index.pending()
+    pending.add("in-flight", ARTICLE)
+
+    assert pending.check("copy", SYNDICATED) == "in-flight"
+    assert index.check("copy", SYNDICATED) is None
+    assert (pending.signature(ARTICLE) == index.signature(ARTICLE)).all()
+    pending.close()
+
+
+def test_index_survives_reopening(index, tmp_path):
+    index.add("original", ARTICLE)
+    index.add("original", ARTICLE)
+
+    reopened = NearDuplicateIndex(index.path)
+
+    assert len(reopened) == 1
+    assert reopened.check("copy", SYNDICATED) == "original"
+    reopened.close()
+
+
+def test_num_perm_has_to_be_a_multiple_of_bands(tmp_path):
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(str(tmp_path / "bad.sqlite3"), num_perm=100, bands=16)
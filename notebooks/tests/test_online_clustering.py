@@ -0,0 +1,107 @@
+import json
+import sqlite3
+
+import numpy as np
+import pytest
+
+from online_clustering import OnlineClusterer
+
+DAY = 24 * 60 * 60
+
+
+def story(direction: int, count: int, dim: int = 8, seed: int = 0) -> np.ndarray:
+    """
+    `count` vectors close to the `direction` axis
+    """
+    rng = np.random.default_rng(seed + direction)
+    vectors = 0.1 * rng.normal(size=(count, dim))
+    vectors[:, direction] += 1.0
+    return vectors
+
+
+@pytest.fixture
+def clusterer(tmp_path):
+    clusterer = OnlineClusterer(str(tmp_path / "clusters.sqlite3"), maintain_interval=float("inf"))
+    yield clusterer
+    clusterer.close()
+
+
+def add_story(clusterer, name: str, direction: int, count: int, now: float = 0.0):
+    ids = [f"{name}-{idx}" for idx in range(count)]
+    return clusterer.add_many(ids, story(direction, count), [{"id": id} for id in ids], now=now)
+
+
+def test_articles_of_one_story_share_a_cluster(clusterer):
+    first = add_story(clusterer, "a", 0, 5)
+    second = add_story(clusterer, "b", 1, 3)
+
+    assert len(set(first)) == 1
+    assert len(set(second)) == 1
+    assert first[0] != second[0]
+    assert len(clusterer) == 2
+
+
+def test_an_article_is_only_counted_once(clusterer):
+    add_story(clusterer, "a", 0, 5)
+    weight = sum(cluster.weight for cluster in clusterer.clusters.values())
+
+    again = add_story(clusterer, "a", 0, 5)
+
+    assert sum(cluster.weight for cluster in clusterer.clusters.values()) == weight
+    assert len(set(again)) == 1
+    assert clusterer.unseen(["a-0", "a-4", "new"]) == ["new"]
+
+
+def test_trimmed_members_are_still_seen(tmp_path):
+    clusterer = OnlineClusterer(str(tmp_path / "clusters.sqlite3"), max_members=2, maintain_interval=float("inf"))
+    add_story(clusterer, "a", 0, 5)
+
+    again = add_story(clusterer, "a", 0, 5)
+
+    assert again.count(None) == 3
+    assert clusterer.unseen([f"a-{idx}" for idx in range(5)]) == []
+    clusterer.close()
+
+
+def test_top_clusters_rank_by_size_and_recency(clusterer):
+    add_story(clusterer, "old", 0, 6, now=0.0)
+    add_story(clusterer, "new", 1, 4, now=10 * DAY)
+
+    top = clusterer.top_clusters(m=2, now=10 * DAY)
+
+    # six articles ten days (five half lives) ago weigh less than four new ones
+    assert [len(members) for _, members in top] == [4, 6]
+    assert {member["id"] for member in top[0][1]} == {f"new-{idx}" for idx in range(4)}
+
+
+def test_maintain_retires_faded_and_merges_converged_clusters(tmp_path):
+    clusterer = OnlineClusterer(str(tmp_path / "clusters.sqlite3"), assign_threshold=0.99, maintain_interval=float("inf"))
+    add_story(clusterer, "a", 0, 4, now=0.0)
+    add_story(clusterer, "b", 1, 1, now=0.0)
+    assert len(clusterer) > 2  # the strict threshold splits story a over several clusters
+
+    # story a is merged into one cluster
+    clusterer.maintain(now=DAY)
+    assert len(clusterer) == 2
+
+    # two and a half half lives later the single article of story b weighs less than retire_weight
+    clusterer.maintain(now=5 * DAY)
+    assert len(clusterer) == 1
+    rows = clusterer._conn.execute("SELECT COUNT(*) FROM members").fetchone()[0]
+    assert rows == 4
+    clusterer.close()
+
+
+def test_state_and_snapshot_survive_reopening(clusterer):
+    add_story(clusterer, "a", 0, 3)
+    clusterer.publish([{"title": "Story a", "cluster": [], "image": ""}])
+    clusterer.publish([{"title": "Story a, updated", "cluster": [], "image": ""}])
+
+    reopened = OnlineClusterer(clusterer.path, maintain_interval=float("inf"))
+
+    assert len(reopened) == 1
+    assert reopened.unseen(["a-0", "b-0"]) == ["b-0"]
+    version, body = sqlite3.connect(clusterer.path).execute("SELECT version, body FROM snapshot").fetchone()
+    assert version == 2
+    assert json.loads(body)[0]["title"] == "Story a, updated"
+    reopened.close()
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from vector_backends import LocalVectorBackend
+
+
+def unit(*values) -> np.ndarray:
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = LocalVectorBackend(str(tmp_path / "vectors"))
+    yield backend
+    backend.close()
+
+
+def test_search_returns_the_closest_points_by_cosine_similarity(backend):
+    backend.upsert(["a", "b", "c"], np.eye(3), [{"n": 0}, {"n": 1}, {"n": 2}])
+
+    hits = backend.search(unit(0.1, 1, 0), limit=2)
+
+    assert [hit.id for hit in hits] == ["b", "a"]
+    assert hits[0].payload == {"n": 1}
+    assert hits[0].score == pytest.approx(float(unit(0.1, 1, 0)[1]), abs=1e-6)
+
+
+def test_upsert_replaces_an_existing_point(backend):
+    backend.upsert(["a", "b"], np.eye(2), [{"v": 1}, {"v": 1}])
+    backend.upsert(["a"], [[0, 1]], [{"v": 2}])
+
+    hits = backend.search([0, 1], limit=5)
+
+    assert backend.count() == 2
+    assert sorted((hit.id, hit.payload["v"]) for hit in hits) == [("a", 2), ("b", 1)]
+
+
+def test_upsert_keeps_the_last_of_an_id_repeated_in_one_batch(backend):
+    backend.upsert(["a", "b", "a"], np.eye(3), [{"v": 1}, {"v": 2}, {"v": 3}])
+
+    hits = backend.search([0, 0, 1], limit=5)
+
+    assert backend.count() == 2
+    assert [(hit.id, hit.payload["v"]) for hit in hits][0] == ("a", 3)
+    assert sorted(hit.id for hit in hits) == ["a", "b"]
+
+
+def test_delete_update_and_overwrite(backend):
+    backend.upsert(["a", "b", "c"], np.eye(3), [{"v": 0}] * 3)
+
+    backend.delete(["c"])
+    backend.update_vectors(["a"], [[0, 1, 0]])
+    backend.overwrite_payloads(["b"], [{"v": 9}])
+
+    hits = backend.search([0, 1, 0], limit=5)
+    assert backend.count() == 2
+    assert sorted((hit.id, hit.payload["v"]) for hit in hits) == [("a", 0), ("b", 9)]
+    assert all(hit.score == pytest.approx(1.0) for hit in hits)
+
+
+def test_state_survives_reopening(backend):
+    rng = np.random.default_rng(0)
+    backend.upsert([f"p{idx}" for idx in range(20)], rng.normal(size=(20, 8)), [{"n": idx} for idx in range(20)])
+    backend.delete(["p3"])
+    query = rng.normal(size=8)
+
+    reopened = LocalVectorBackend(backend.path)
+
+    assert reopened.count() == 19
+    assert [hit.id for hit in reopened.search(query, 5)] == [hit.id for hit in backend.search(query, 5)]
+    reopened.close()
+
+
+def test_iter_points_pages_over_every_live_point(backend):
+    backend.upsert([f"p{idx}" for idx in range(25)], np.random.default_rng(1).normal(size=(25, 4)), [{}] * 25)
+    backend.delete(["p0", "p24"])
+
+    pages = list(backend.iter_points(batch_size=10))
+
+    assert [len(page) for page in pages] == [10, 10, 3]
+    assert sorted(point.id for page in pages for point in page) == sorted(f"p{idx}" for idx in range(1, 24))
+
+
+def test_ivf_search_finds_the_exact_neighbors_of_clustered_data(tmp_path):
+    rng = np.random.default_rng(2)
+    centers = rng.normal(size=(8, 16))
+    vectors = np.repeat(centers, 100, axis=0) + 0.05 * rng.normal(size=(800, 16))
+    backend = LocalVectorBackend(str(tmp_path / "ivf"), exact_threshold=100, nprobe=2)
+    backend.upsert([str(idx) for idx in range(800)], vectors, [{}] * 800)
+
+    hits = backend.search(vectors[123], limit=1)
+
+    assert backend._ivf is not None
+    assert hits[0].id == "123"
+    assert hits[0].score == pytest.approx(1.0, abs=1e-5)
+    backend.close()
@@ -0,0 +1,127 @@
+import re
+import threading
+from typing import List
+
+from token_counter import count_tokens, split_by_tokens
+
+# Lines that are page furniture rather than article text. Every pattern has to match the whole
+# line, so article sentences that merely mention cookies or subscriptions are kept
+BOILERPLATE_PATTERNS = [
+    r"advertisement",
+    r"(sponsored|promoted)( content)?",
+    r"(related|read more|read next|see also|more from|recommended|most read|trending)( \w+)?( ?[:|>»-].*)?",
+    r"(sign up|subscribe|register)( now| here| today| for free)?( (to|for) .*(newsletter|updates|alerts|briefing|inbox).*)?",
+    r"(get|receive) .*(newsletter|in your inbox).*",
+    r"(follow us|share (this|on)|click here|tap here)\b.*",
+    r"check out (more|our)\b.*",
+    r"visit the .* website\b.*",
+    r"discover\b.*:.*",
+    r"(we use cookies|this (site|website) uses cookies|by (using|continuing)\b.*\bcookies)\b.*",
+    r"(©|\(c\)|copyright)?.*all rights reserved\.?",
+    r"(privacy policy|cookie (policy|settings)|terms of (use|service)|contact us|about us)([ |·•,-]+(privacy policy|cookie (policy|settings)|terms of (use|service)|contact us|about us))*",
+    r"(image|photo|picture|video)( credit)?s?:.*",
+    r"\(?(getty|pa|reuters|ap|afp)( images)?\)?",
+]
+BOILERPLATE_RE = re.compile("|".join(f"(?:{pattern})" for pattern in BOILERPLATE_PATTERNS), re.IGNORECASE)
+
+# Longer lines are treated as article text even if they match a boilerplate pattern
+MAX_BOILERPLATE_LINE_LENGTH = 120
+
+
+def strip_boilerplate(text: str) -> str:
+    """
+    Remove boilerplate lines (ads, newsletter and social prompts, related links, credits),
+    repeated lines and redundant whitespace.
+    """
+    seen = set()
+    lines = []
+    for line in text.splitlines():
+        line = re.sub(r"\s+", " ", line).strip()
+        if not line:
+            continue
+        if len(line) <= MAX_BOILERPLATE_LINE_LENGTH and BOILERPLATE_RE.fullmatch(line):
+            continue
+        if line.lower() in seen:
+            continue
+        seen.add(line.lower())
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if count_tokens(text) <= max_tokens:
+        return text
+    return split_by_tokens(text, max_tokens)[0]
+
+
+def split_into_chunks(text: str, chunk_tokens: int) -> List[str]:
+    """
+    Split the text into chunks of at most `chunk_tokens` tokens at line boundaries,
+    lines longer than a chunk are split by tokens.
+    """
+    chunks = []
+    current: List[str] = []
+    current_tokens = 0
+    for line in text.splitlines():
+        tokens = count_tokens(line) + 1
+        if current and current_tokens + tokens > chunk_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        if tokens > chunk_tokens:
+            chunks.extend(split_by_tokens(line, chunk_tokens))
+            continue
+        current.append(line)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+class TextPreprocessor:
+    """
+    Prepares scraped article text for the extraction prompt.
+
+    - boilerplate is stripped
+    - text up to `max_tokens` is used as is
+    - longer text is truncated to `max_tokens`, or split into chunks of `max_tokens` for a
+      map-reduce extraction if it is longer than `chunk_threshold` tokens
+    - chunks after the first `max_chunks` are dropped, which is printed and counted in
+      `truncated_articles` / `dropped_chunks` (prepare is called from the extraction threads,
+      the counters are updated under a lock)
+    """
+
+    def __init__(self, max_tokens: int = 3000, chunk_threshold: int = 6000, max_chunks: int = 8):
+        self.max_tokens = max_tokens
+        self.chunk_threshold = chunk_threshold
+        self.max_chunks = max_chunks
+        self.truncated_articles = 0
+        self.dropped_chunks = 0
+        self._lock = threading.Lock()
+
+    def input_tokens(self, text: str) -> int:
+        """
+        tokens of the largest part `prepare` makes of the text (the boilerplate stripped text, at most
+        `max_tokens`), without counting truncated articles
+        """
+        return min(count_tokens(strip_boilerplate(text)), self.max_tokens)
+
+    def prepare(self, text: str) -> List[str]:
+        """
+        the parts to extract: a single (maybe truncated) text, or several chunks to extract and merge
+        """
+        text = strip_boilerplate(text)
+        tokens = count_tokens(text)
+        if tokens <= self.max_tokens:
+            return [text]
+        if self.chunk_threshold is None or tokens <= self.chunk_threshold:
+            return [truncate_to_tokens(text, self.max_tokens)]
+        chunks = split_into_chunks(text, self.max_tokens)
+        if self.max_chunks is not None and len(chunks) > self.max_chunks:
+            dropped = chunks[self.max_chunks:]
+            with self._lock:
+                self.truncated_articles += 1
+                self.dropped_chunks += len(dropped)
+            print(f"Article of {tokens} tokens split into {len(chunks)} chunks, only the first {self.max_chunks} are extracted "
+                  f"({sum(count_tokens(chunk) for chunk in dropped)} tokens dropped)")
+            chunks = chunks[:self.max_chunks]
+        return chunks
@@ -0,0 +1,41 @@
+from functools import lru_cache
+from typing import List
+
+import tiktoken
+
+# Rough characters per token of English text, used when no tiktoken encoding can be loaded
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = "gpt-4o"):
+    """
+    tiktoken encoding of the model, None if it can not be loaded (e.g. offline without a tiktoken cache)
+    """
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"Failed to load tiktoken encoding for {model}, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    encoding = get_encoding(model)
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_by_tokens(text: str, max_tokens: int, model: str = "gpt-4o") -> List[str]:
+    """
+    split the text into pieces of at most `max_tokens` tokens
+    """
+    encoding = get_encoding(model)
+    if encoding is None:
+        size = max_tokens * CHARS_PER_TOKEN
+        return [text[start:start + size] for start in range(0, len(text), size)] or [""]
+    tokens = encoding.encode(text, disallowed_special=())
+    return [encoding.decode(tokens[start:start + max_tokens]) for start in range(0, len(tokens), max_tokens)] or [""]
@@ -0,0 +1,496 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from qdrant_client.http.models import (
+    Distance,
+    OverwritePayloadOperation,
+    PointIdsList,
+    PointStruct,
+    PointVectors,
+    SearchRequest,
+    SetPayload,
+    VectorParams,
+)
+
+from similarity import normalize_rows, top_k
+
+# with_payload: True for the whole payload, False for none, or the list of payload keys to return
+PayloadSelector = Union[bool, List[str]]
+
+
+class VectorPoint:
+    """
+    A point returned by a local backend, with the attributes of Qdrant's ScoredPoint / Record.
+    """
+
+    __slots__ = ("id", "score", "payload", "vector")
+
+    def __init__(self, id: str, score: Optional[float], payload: Optional[Dict], vector: Optional[List[float]]):
+        self.id = id
+        self.score = score
+        self.payload = payload
+        self.vector = vector
+
+    def __repr__(self) -> str:
+        return f"VectorPoint(id={self.id!r}, score={self.score!r})"
+
+
+class VectorBackend(ABC):
+    """
+    Vector store interface used by IndexBuilder. Search results have `id`, `score`, `payload` and `vector`.
+    """
+
+    @abstractmethod
+    def search(self, vector, limit: int, with_vectors: bool = False, with_payload: PayloadSelector = True) -> List[Any]:
+        ...
+
+    def search_batch(
+        self, vectors, limit: int, with_vectors: bool = False, with_payload: PayloadSelector = True
+    ) -> List[List[Any]]:
+        return [self.search(vector, limit, with_vectors=with_vectors, with_payload=with_payload) for vector in vectors]
+
+    @abstractmethod
+    def upsert(self, ids: Sequence[str], vectors, payloads: Sequence[Dict]):
+        ...
+
+    @abstractmethod
+    def scroll(
+        self, limit: int, offset=None, with_payload: PayloadSelector = True, with_vectors: bool = False
+    ) -> Tuple[List[Any], Any]:
+        """
+        a page of points and the offset of the next page (None after the last page)
+        """
+        ...
+
+    def iter_points(
+        self, batch_size: int = 1000, with_payload: PayloadSelector = True, with_vectors: bool = False
+    ) -> Iterator[List[Any]]:
+        """
+        All points of the collection, one page of at most `batch_size` points at a time, following the
+        scroll offsets. Only one page is held in memory. Deleting or updating points of a page that was
+        already yielded does not change the pages that follow.
+        """
+        offset = None
+        while True:
+            points, offset = self.scroll(limit=batch_size, offset=offset, with_payload=with_payload, with_vectors=with_vectors)
+            if points:
+                yield points
+            if offset is None:
+                return
+
+    @abstractmethod
+    def delete(self, ids: Sequence):
+        ...
+
+    @abstractmethod
+    def update_vectors(self, ids: Sequence, vectors):
+        """
+        replace the vectors of existing points, their payloads are kept
+        """
+        ...
+
+    @abstractmethod
+    def overwrite_payloads(self, ids: Sequence, payloads: Sequence[Dict]):
+        """
+        replace the payloads of existing points, their vectors are kept
+        """
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    def add_documents(self, documents, embed_model):
+        """
+        embed the llama-index documents and store them with their metadata as payload
+        """
+        embeddings = embed_model.get_text_embedding_batch([document.get_content() for document in documents])
+        self.upsert([document.doc_id for document in documents], embeddings, [document.metadata for document in documents])
+
+
+class QdrantBackend(VectorBackend):
+    """
+    A collection of a Qdrant server (or of an in-memory QdrantClient).
+    """
+
+    def __init__(self, client, collection_name: str, vector_store=None):
+        self.client = client
+        self.collection_name = collection_name
+        self.vector_store = vector_store
+
+    def search(self, vector, limit: int, with_vectors: bool = False, with_payload: PayloadSelector = True) -> List[Any]:
+        return self.client.search(
+            collection_name=self.collection_name,
+            query_vector=vector,
+            limit=limit,
+            with_vectors=with_vectors,
+            with_payload=with_payload,
+        )
+
+    def search_batch(
+        self, vectors, limit: int, with_vectors: bool = False, with_payload: PayloadSelector = True
+    ) -> List[List[Any]]:
+        if not len(vectors):
+            return []
+        return self.client.search_batch(
+            collection_name=self.collection_name,
+            requests=[
+                SearchRequest(
+                    vector=[float(value) for value in vector],
+                    limit=limit,
+                    with_payload=with_payload,
+                    with_vector=with_vectors,
+                )
+                for vector in vectors
+            ],
+        )
+
+    def upsert(self, ids: Sequence[str], vectors, payloads: Sequence[Dict]):
+        vectors = [[float(value) for value in vector] for vector in vectors]
+        if not vectors:
+            return
+        if not self.client.collection_exists(self.collection_name):
+            self.client.create_collection(
+                collection_name=self.collection_name,
+                vectors_config=VectorParams(size=len(vectors[0]), distance=Distance.COSINE),
+            )
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=[PointStruct(id=id, vector=vector, payload=payload) for id, vector, payload in zip(ids, vectors, payloads)],
+        )
+
+    def scroll(
+        self, limit: int, offset=None, with_payload: PayloadSelector = True, with_vectors: bool = False
+    ) -> Tuple[List[Any], Any]:
+        return self.client.scroll(
+            collection_name=self.collection_name,
+            limit=limit,
+            offset=offset,
+            with_payload=with_payload,
+            with_vectors=with_vectors,
+        )
+
+    def delete(self, ids: Sequence):
+        self.client.delete(collection_name=self.collection_name, points_selector=PointIdsList(points=list(ids)))
+
+    def update_vectors(self, ids: Sequence, vectors):
+        if not len(ids):
+            return
+        self.client.update_vectors(
+            collection_name=self.collection_name,
+            points=[PointVectors(id=id, vector=[float(value) for value in vector]) for id, vector in zip(ids, vectors)],
+        )
+
+    def overwrite_payloads(self, ids: Sequence, payloads: Sequence[Dict]):
+        if not len(ids):
+            return
+        # one request for the whole batch
+        self.client.batch_update_points(
+            collection_name=self.collection_name,
+            update_operations=[
+                OverwritePayloadOperation(overwrite_payload=SetPayload(payload=payload, points=[id]))
+                for id, payload in zip(ids, payloads)
+            ],
+        )
+
+    def count(self) -> int:
+        return self.client.count(collection_name=self.collection_name).count
+
+    def add_documents(self, documents, embed_model):
+        """
+        index the documents through llama-index, so the collection keeps the QdrantVectorStore layout
+        """
+        from llama_index.core import StorageContext, VectorStoreIndex
+
+        storage_context = StorageContext.from_defaults(vector_store=self.vector_store)
+        return VectorStoreIndex.from_documents(documents, storage_context=storage_context, embed_model=embed_model)
+
+
+class LocalVectorBackend(VectorBackend):
+    """
+    In-process vector store in a directory, for local runs and offline tests.
+
+    - vectors.f32: memory-mapped, unit length float32 vectors, one row per point (scores are cosine similarities)
+    - points.sqlite3: payload sidecar, maps rows to point ids and marks deleted rows
+    - ivf.npz: IVF index (k-means centroids and the inverted lists of rows)
+
+    Up to `exact_threshold` points every search is one exact matrix multiply. Above, the IVF index is
+    built and a search only scores the rows of the `nprobe` closest lists, plus the rows added since
+    the last build. The index is rebuilt once those are more than `rebuild_ratio` of the indexed rows.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        exact_threshold: int = 1024,
+        nprobe: int = 8,
+        rebuild_ratio: float = 0.2,
+        seed: int = 1,
+    ):
+        self.path = path
+        self.exact_threshold = exact_threshold
+        self.nprobe = nprobe
+        self.rebuild_ratio = rebuild_ratio
+        self.seed = seed
+        os.makedirs(path, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(path, "points.sqlite3"), check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS points ("
+                "row INTEGER PRIMARY KEY, id TEXT NOT NULL, payload TEXT NOT NULL, deleted INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS points_id ON points (id)")
+
+        self._meta_path = os.path.join(path, "meta.json")
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._ivf_path = os.path.join(path, "ivf.npz")
+        self.dim: Optional[int] = None
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+
+        self._vectors = np.empty((0, self.dim or 0), dtype=np.float32)
+        self._ids: List[Optional[str]] = []
+        self._deleted = np.empty(0, dtype=bool)
+        self._ivf = None
+        self._load()
+
+    # storage
+
+    def _load(self):
+        rows = self._conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM points").fetchone()[0]
+        if self.dim is None or rows == 0:
+            self._vectors = np.empty((0, self.dim or 0), dtype=np.float32)
+        else:
+            # rows written to the vector file without a sidecar entry (interrupted upsert) are dropped
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(rows * self.dim * 4)
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+
+        self._ids = [None] * rows
+        self._deleted = np.zeros(rows, dtype=bool)
+        for row, id, deleted in self._conn.execute("SELECT row, id, deleted FROM points"):
+            self._ids[row] = id
+            self._deleted[row] = bool(deleted)
+
+        self._ivf = None
+        if os.path.exists(self._ivf_path):
+            data = np.load(self._ivf_path)
+            self._ivf = {key: data[key] for key in data.files}
+
+    def upsert(self, ids: Sequence[str], vectors, payloads: Sequence[Dict]):
+        if not len(ids):
+            return
+        vectors = normalize_rows(vectors)
+        ids = [str(id) if id is not None else str(uuid.uuid4()) for id in ids]
+        # an id given more than once in the batch keeps its last vector and payload
+        last = {id: idx for idx, id in enumerate(ids)}
+        if len(last) < len(ids):
+            keep = sorted(last.values())
+            ids = [ids[idx] for idx in keep]
+            vectors = vectors[keep]
+            payloads = [payloads[idx] for idx in keep]
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self._meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim}, f)
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected vectors of dimension {self.dim}, got {vectors.shape[1]}.")
+
+            start = len(self._deleted)
+            # a new version of a point replaces the old row
+            replaced = list(self._rows_of(ids).values())
+            with open(self._vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            with self._conn:
+                self._conn.executemany("UPDATE points SET deleted = 1 WHERE row = ?", [(row,) for row in replaced])
+                self._conn.executemany(
+                    "INSERT INTO points (row, id, payload) VALUES (?, ?, ?)",
+                    [(start + idx, id, json.dumps(payload)) for idx, (id, payload) in enumerate(zip(ids, payloads))],
+                )
+            # the new rows are appended to the in-memory state instead of reloading it, the IVF index
+            # scores rows added after its build until the next rebuild
+            self._ids.extend(ids)
+            self._deleted = np.concatenate([self._deleted, np.zeros(len(ids), dtype=bool)])
+            self._deleted[replaced] = True
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(len(self._ids), self.dim))
+
+    def _rows_of(self, ids: Sequence) -> Dict[str, int]:
+        """
+        rows of the live points with the given ids, by id
+        """
+        ids = [str(id) for id in ids]
+        rows = {}
+        for start in range(0, len(ids), 500):
+            part = ids[start:start + 500]
+            query = f"SELECT id, row FROM points WHERE deleted = 0 AND id IN ({','.join('?' * len(part))})"
+            rows.update(self._conn.execute(query, part).fetchall())
+        return rows
+
+    def delete(self, ids: Sequence):
+        with self._lock:
+            rows = list(self._rows_of(ids).values())
+            with self._conn:
+                self._conn.executemany("UPDATE points SET deleted = 1 WHERE row = ?", [(row,) for row in rows])
+            # only the deleted rows change, the rest of the in-memory state is kept
+            self._deleted[rows] = True
+
+    def update_vectors(self, ids: Sequence, vectors):
+        if not len(ids):
+            return
+        vectors = normalize_rows(vectors)
+        with self._lock:
+            rows = self._rows_of(ids)
+            found = [idx for idx, id in enumerate(ids) if str(id) in rows]
+            if not found:
+                return
+            # written in place, the read-only map of the same file sees the new values
+            writable = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=self._vectors.shape)
+            writable[[rows[str(ids[idx])] for idx in found]] = vectors[found]
+            writable.flush()
+            del writable
+            # the inverted lists no longer match the vectors, the next search rebuilds them
+            self._ivf = None
+            if os.path.exists(self._ivf_path):
+                os.remove(self._ivf_path)
+
+    def overwrite_payloads(self, ids: Sequence, payloads: Sequence[Dict]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE points SET payload = ? WHERE id = ? AND deleted = 0",
+                [(json.dumps(payload), str(id)) for id, payload in zip(ids, payloads)],
+            )
+
+    def count(self) -> int:
+        return int((~self._deleted).sum())
+
+    def _points(self, rows: Sequence[int], scores, with_payload: PayloadSelector, with_vectors: bool) -> List[VectorPoint]:
+        rows = [int(row) for row in rows]
+        payloads = {}
+        # payloads are only read from the sidecar when requested
+        for start in range(0, len(rows) if with_payload is not False else 0, 500):
+            part = rows[start:start + 500]
+            query = f"SELECT row, payload FROM points WHERE row IN ({','.join('?' * len(part))})"
+            payloads.update(self._conn.execute(query, part).fetchall())
+
+        points = []
+        for row, score in zip(rows, scores):
+            payload = None
+            if with_payload is not False:
+                payload = json.loads(payloads[row])
+                if with_payload is not True:
+                    payload = {key: payload[key] for key in with_payload if key in payload}
+            vector = self._vectors[row].tolist() if with_vectors else None
+            points.append(VectorPoint(self._ids[row], None if score is None else float(score), payload, vector))
+        return points
+
+    # index
+
+    def build_index(self, nlist: Optional[int] = None, iterations: int = 10, sample_size: int = 50000):
+        """
+        (Re)build the IVF index with spherical k-means over a sample of the vectors.
+        """
+        with self._lock:
+            rows = np.flatnonzero(~self._deleted)
+            if len(rows) == 0:
+                return
+            # balances scoring the centroids against scoring the rows of the probed lists
+            nlist = nlist or max(1, int(np.sqrt(self.nprobe * len(rows))))
+            rng = np.random.default_rng(self.seed)
+            sample = self._vectors[np.sort(rng.choice(rows, size=min(sample_size, len(rows)), replace=False))]
+            centroids = sample[rng.choice(len(sample), size=min(nlist, len(sample)), replace=False)].copy()
+            for _ in range(iterations):
+                assignments = np.argmax(sample @ centroids.T, axis=1)
+                for idx in range(len(centroids)):
+                    members = sample[assignments == idx]
+                    if len(members):
+                        centroids[idx] = members.mean(axis=0)
+                centroids = normalize_rows(centroids)
+
+            # inverted lists: rows ordered by their list, offsets[i]:offsets[i+1] are the rows of list i
+            assignments = np.empty(len(rows), dtype=np.int64)
+            for start in range(0, len(rows), 65536):
+                assignments[start:start + 65536] = np.argmax(self._vectors[rows[start:start + 65536]] @ centroids.T, axis=1)
+            order = np.argsort(assignments, kind="stable")
+            offsets = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+            self._ivf = {
+                "centroids": centroids,
+                "rows": rows[order],
+                "offsets": offsets,
+                "indexed": np.array(len(self._deleted)),
+            }
+            np.savez(self._ivf_path, **self._ivf)
+
+    def _candidate_rows(self, query: np.ndarray) -> np.ndarray:
+        total = len(self._deleted)
+        if total <= self.exact_threshold:
+            return np.flatnonzero(~self._deleted)
+
+        if self._ivf is None or total - int(self._ivf["indexed"]) > self.rebuild_ratio * int(self._ivf["indexed"]):
+            self.build_index()
+        centroids, rows, offsets = self._ivf["centroids"], self._ivf["rows"], self._ivf["offsets"]
+        lists = top_k(centroids @ query, self.nprobe)
+        candidates = np.concatenate(
+            [rows[offsets[idx]:offsets[idx + 1]] for idx in lists]
+            # rows added after the index was built are always scored
+            + [np.arange(int(self._ivf["indexed"]), total)]
+        )
+        return candidates[~self._deleted[candidates]]
+
+    # search
+
+    def search(self, vector, limit: int, with_vectors: bool = False, with_payload: PayloadSelector = True) -> List[VectorPoint]:
+        return self.search_batch([vector], limit, with_vectors=with_vectors, with_payload=with_payload)[0]
+
+    def search_batch(
+        self, vectors, limit: int, with_vectors: bool = False, with_payload: PayloadSelector = True
+    ) -> List[List[VectorPoint]]:
+        if not len(vectors):
+            return []
+        queries = normalize_rows(vectors)
+        with self._lock:
+            if len(self._deleted) == 0:
+                return [[] for _ in queries]
+
+            results = []
+            if len(self._deleted) <= self.exact_threshold:
+                # all queries against all vectors with one matrix multiply, deleted rows never win
+                scores = self._vectors @ queries.T
+                scores[self._deleted] = -np.inf
+                limit = min(limit, self.count())
+                for column in range(len(queries)):
+                    best = top_k(scores[:, column], limit)
+                    results.append(self._points(best, scores[best, column], with_payload, with_vectors))
+                return results
+
+            for query in queries:
+                rows = self._candidate_rows(query)
+                scores = self._vectors[rows] @ query
+                best = top_k(scores, limit)
+                results.append(self._points(rows[best], scores[best], with_payload, with_vectors))
+            return results
+
+    def scroll(
+        self, limit: int, offset=None, with_payload: PayloadSelector = True, with_vectors: bool = False
+    ) -> Tuple[List[VectorPoint], Optional[int]]:
+        with self._lock:
+            rows = [
+                row for (row,) in self._conn.execute(
+                    "SELECT row FROM points WHERE deleted = 0 AND row >= ? ORDER BY row LIMIT ?",
+                    (offset or 0, limit + 1),
+                )
+            ]
+            next_offset = rows.pop() if len(rows) > limit else None
+            return self._points(rows, [None] * len(rows), with_payload, with_vectors), next_offset
+
+    def close(self):
+        self._conn.close()